@@ -0,0 +1,182 @@
+import asyncio
+import math
+import time
+import logging
+from collections import deque
+from typing import Dict, Any, Deque, Tuple
+from limits.storage import storage_from_string
+from app.core.config import settings
+from app.utils import metrics
+import app.utils.sqlite_limits  # noqa: F401  registers the sqlite:// storage scheme
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest job in the running real-time-factor estimate
+RTF_SMOOTHING = 0.2
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; carries the HTTP status and Retry-After seconds"""
+
+    def __init__(self, detail: str, status_code: int, retry_after: int):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """Admits transcriptions against a global budget of in-flight audio seconds.
+
+    Requests that do not fit wait in a bounded FIFO queue for up to max_wait
+    seconds. A request bigger than the whole budget is admitted only when
+    nothing else is running. Retry-After is estimated from the backlog and
+    the observed real-time factor.
+    """
+
+    def __init__(self, budget_seconds: float, max_waiting: int, max_wait: float, workers: int):
+        self.budget_seconds = budget_seconds
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.workers = max(1, workers)
+        self.in_flight_seconds = 0.0
+        self.rtf = settings.ADMISSION_INITIAL_RTF
+        self.rejections = 0
+        self._waiters: Deque[Tuple[float, asyncio.Future]] = deque()
+
+    @property
+    def waiting_seconds(self) -> float:
+        return sum(cost for cost, _ in self._waiters)
+
+    def _fits(self, cost: float) -> bool:
+        return self.in_flight_seconds == 0 or self.in_flight_seconds + cost <= self.budget_seconds
+
+    def retry_after(self, cost: float = 0.0) -> int:
+        """Seconds until a request of `cost` audio seconds would likely be admitted"""
+        excess = self.in_flight_seconds + self.waiting_seconds + cost - self.budget_seconds
+        return max(1, math.ceil(max(excess, 0.0) * self.rtf / self.workers))
+
+    async def acquire(self, cost: float):
+        """Reserve `cost` audio seconds, waiting in line if the budget is taken"""
+        if not self._waiters and self._fits(cost):
+            self.in_flight_seconds += cost
+            return
+
+        if len(self._waiters) >= self.max_waiting:
+            self._reject("Server busy, transcription queue is full", cost)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (cost, future)
+        self._waiters.append(entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except asyncio.TimeoutError:
+            if future.done():
+                # Admitted just as the wait expired; keep the reservation
+                return
+            self._remove_waiter(entry)
+            self._reject("Server busy, timed out waiting for capacity", cost)
+        except asyncio.CancelledError:
+            # Client went away while waiting
+            if future.done():
+                self.release(cost)
+            else:
+                self._remove_waiter(entry)
+            raise
+
+    def release(self, cost: float):
+        """Return reserved audio seconds and admit waiters that now fit, in order"""
+        self.in_flight_seconds = max(0.0, self.in_flight_seconds - cost)
+        self._wake_waiters()
+
+    def _remove_waiter(self, entry: Tuple[float, asyncio.Future]):
+        """Drop a waiter that gave up; if it was blocking the head, those behind it may now fit"""
+        self._waiters.remove(entry)
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        """Admit waiters from the head of the queue, in order, while they fit"""
+        while self._waiters and self._fits(self._waiters[0][0]):
+            cost, future = self._waiters.popleft()
+            self.in_flight_seconds += cost
+            future.set_result(None)
+
+    def observe(self, processing_seconds: float, audio_seconds: float):
+        """Fold a finished job's real-time factor into the estimate"""
+        if audio_seconds > 0:
+            self.rtf += RTF_SMOOTHING * (processing_seconds / audio_seconds - self.rtf)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget_seconds": self.budget_seconds,
+            "in_flight_seconds": round(self.in_flight_seconds, 1),
+            "waiting": len(self._waiters),
+            "waiting_seconds": round(self.waiting_seconds, 1),
+            "real_time_factor": round(self.rtf, 3),
+            "rejections": self.rejections,
+        }
+
+    def _reject(self, detail: str, cost: float):
+        self.rejections += 1
+        metrics.admission_rejections.inc(reason="capacity")
+        raise AdmissionRejected(detail, 503, self.retry_after(cost))
+
+class ClientQuota:
+    """Per-client fixed-window quota in audio seconds.
+
+    Usage is counted in the rate-limit storage (RATE_LIMIT_STORAGE_URI), so
+    pre-forked workers sharing a SQLite or Redis store enforce one quota.
+    """
+
+    def __init__(self, limit_seconds: float, window: int, storage_uri: str):
+        self.limit_seconds = limit_seconds
+        self.window = window
+        self._storage = storage_from_string(storage_uri) if limit_seconds > 0 else None
+
+    @property
+    def enabled(self) -> bool:
+        return self._storage is not None
+
+    def _key(self, client: str) -> str:
+        return f"bloomnote/audio-quota/{client}"
+
+    def charge(self, client: str, cost: float) -> int:
+        """Record `cost` audio seconds against a client, or raise AdmissionRejected (429).
+
+        Returns the charge to pass to refund(), 0 when nothing was recorded.
+        Blocks on the storage, so call it off the event loop.
+        """
+        if not self.enabled:
+            return 0
+        amount = max(1, math.ceil(cost))
+        key = self._key(client)
+        used = self._storage.incr(key, self.window, amount)
+        if used < amount:
+            # The store failed open (e.g. a busy SQLite file) and counted nothing;
+            # refunding this charge later would push the counter below zero
+            return 0
+        if used > self.limit_seconds:
+            self._storage.incr(key, self.window, -amount)
+            retry_after = self._storage.get_expiry(key) - time.time()
+            metrics.admission_rejections.inc(reason="quota")
+            raise AdmissionRejected(
+                f"Audio quota exceeded: {(used - amount) / 60:.1f} of {self.limit_seconds / 60:.0f} minutes used "
+                f"in the current {self.window / 60:.0f}-minute window",
+                429, max(1, math.ceil(retry_after)),
+            )
+        return amount
+
+    def refund(self, client: str, amount: int):
+        """Give back a charge that was not used, e.g. when admission then failed; blocks like charge()"""
+        if self.enabled and amount:
+            self._storage.incr(self._key(client), self.window, -amount)
+
+admission_controller = AdmissionController(
+    settings.ADMISSION_BUDGET_MINUTES * 60,
+    settings.ADMISSION_MAX_WAITING,
+    settings.ADMISSION_MAX_WAIT_SECONDS,
+    settings.INFERENCE_WORKERS,
+)
+client_quota = ClientQuota(settings.CLIENT_AUDIO_MINUTES_PER_HOUR * 60, 3600, settings.RATE_LIMIT_STORAGE_URI)
+metrics.admission_audio_seconds.set_function(lambda: {
+    ("in_flight",): admission_controller.in_flight_seconds,
+    ("waiting",): admission_controller.waiting_seconds,
+})
@@ -0,0 +1,205 @@
+import asyncio
+import time
+import logging
+import numpy as np
+from concurrent.futures import Executor
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from app.core.config import settings
+from app.core.models import get_model, get_inference_lock
+from app.utils.file_utils import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# Whisper's fixed 30-second input window
+MAX_BATCH_CLIP_SECONDS = 30
+
+# Same thresholds model.transcribe uses to decide a decode needs a temperature fallback
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+# Seconds per timestamp token step
+TIME_PRECISION = 0.02
+
+class _PendingClip:
+    def __init__(self, audio: np.ndarray, language: Optional[str], task: str, model_size: Optional[str],
+                 future: asyncio.Future):
+        self.audio = audio
+        self.language = language
+        self.task = task
+        self.model_size = model_size
+        self.future = future
+
+def split_timestamped_tokens(tokens: List[int], timestamp_begin: int, decode: Callable[[List[int]], str],
+                             clip_seconds: float) -> List[Dict[str, Any]]:
+    """Cut a decoded token stream into segments at its timestamp tokens, as model.transcribe does.
+
+    Pairs of consecutive timestamp tokens close one segment and open the next;
+    without any pair the whole stream is a single segment ending at the last
+    timestamp (or the clip end).
+    """
+    is_timestamp = [token >= timestamp_begin for token in tokens]
+    boundaries = [i + 1 for i in range(len(tokens) - 1) if is_timestamp[i] and is_timestamp[i + 1]]
+    if boundaries:
+        if boundaries[-1] < len(tokens):
+            boundaries.append(len(tokens))
+        pieces = [tokens[start:end] for start, end in zip([0] + boundaries, boundaries)]
+        # model.transcribe would re-decode an unterminated tail from its last timestamp;
+        # a batched clip is never decoded again, so that tail runs to the clip end instead
+        spans = [((piece[0] - timestamp_begin) * TIME_PRECISION,
+                  (piece[-1] - timestamp_begin) * TIME_PRECISION if piece[-1] >= timestamp_begin else clip_seconds)
+                 for piece in pieces]
+    else:
+        stamps = [token for token, stamp in zip(tokens, is_timestamp) if stamp]
+        end = clip_seconds
+        if stamps and stamps[-1] != timestamp_begin:
+            end = (stamps[-1] - timestamp_begin) * TIME_PRECISION
+        pieces, spans = [tokens], [(0.0, end)]
+
+    segments = []
+    for piece, (start, end) in zip(pieces, spans):
+        text = decode([token for token in piece if token < timestamp_begin])
+        if not text.strip():
+            continue
+        segments.append({
+            "id": len(segments),
+            "seek": 0,
+            "start": round(min(start, clip_seconds), 3),
+            "end": round(min(end, clip_seconds), 3),
+            "text": text,
+            "tokens": piece,
+        })
+    return segments
+
+def _decode_batch(audios: List[np.ndarray], language: Optional[str], task: str,
+                  model_size: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Run one encoder/decoder pass over a stacked log-mel batch"""
+    import torch
+    import whisper
+    from whisper.tokenizer import get_tokenizer
+
+    model = get_model(model_size)
+    inference_lock = get_inference_lock(model_size)
+    mels = torch.stack([
+        whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(audio)), model.dims.n_mels)
+        for audio in audios
+    ]).to(model.device)
+    options = whisper.DecodingOptions(task=task, language=language, fp16=False, without_timestamps=False)
+
+    with inference_lock:
+        decoded = whisper.decode(model, mels, options)
+
+    results = []
+    for audio, result in zip(audios, decoded):
+        needs_fallback = (
+            result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+            or result.avg_logprob < LOGPROB_THRESHOLD
+        )
+        is_silent = result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD
+        if needs_fallback and not is_silent:
+            # Let the full transcribe loop retry this clip with temperature fallback
+            fallback_options = {k: v for k, v in {"fp16": False, "language": language, "task": task}.items() if v is not None}
+            with inference_lock:
+                results.append(model.transcribe(audio, **fallback_options))
+            continue
+
+        if is_silent:
+            results.append({"text": "", "segments": [], "language": result.language})
+            continue
+
+        tokenizer = get_tokenizer(
+            model.is_multilingual, num_languages=model.num_languages, language=result.language, task=task
+        )
+        segments = split_timestamped_tokens(result.tokens, tokenizer.timestamp_begin, tokenizer.decode,
+                                            len(audio) / SAMPLE_RATE)
+        for segment in segments:
+            segment.update(
+                temperature=result.temperature,
+                avg_logprob=result.avg_logprob,
+                compression_ratio=result.compression_ratio,
+                no_speech_prob=result.no_speech_prob,
+            )
+        results.append({"text": result.text, "segments": segments, "language": result.language})
+    return results
+
+class BatchScheduler:
+    """Collects short clips from concurrent requests and decodes them as one batch.
+
+    The first clip to arrive opens a window of max_wait_ms; the batch is run as
+    soon as it fills up or the window closes. Clips are grouped by (language,
+    task, model size) since a batch shares one model and one set of decoding
+    options. Clips are decoded with timestamps and split into segments the
+    same way model.transcribe splits them.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait_ms: int):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.batches_run = 0
+        self.clips_batched = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[Executor] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._task is not None
+
+    def accepts(self, audio: Optional[np.ndarray]) -> bool:
+        """Whether a loaded clip is short enough to go through the batcher"""
+        return self.enabled and audio is not None and len(audio) <= MAX_BATCH_CLIP_SECONDS * SAMPLE_RATE
+
+    async def start(self, executor: Executor):
+        """Start collecting batches; inference runs on the given executor"""
+        self._queue = asyncio.Queue()
+        self._executor = executor
+        self._task = asyncio.create_task(self._collect())
+        logger.info(f"📚 Batching short clips (max {self.max_batch_size}, wait {self.max_wait * 1000:.0f}ms)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def transcribe(self, audio: np.ndarray, language: Optional[str] = None, task: str = "transcribe",
+                         model_size: Optional[str] = None) -> Dict[str, Any]:
+        """Queue a clip for the next batch and wait for its result"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingClip(audio, language, task, model_size, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            groups: Dict[Tuple[Optional[str], str, Optional[str]], List[_PendingClip]] = {}
+            for clip in batch:
+                groups.setdefault((clip.language, clip.task, clip.model_size), []).append(clip)
+
+            for (language, task, model_size), clips in groups.items():
+                try:
+                    results = await loop.run_in_executor(
+                        self._executor, _decode_batch, [clip.audio for clip in clips], language, task, model_size
+                    )
+                except Exception as e:
+                    for clip in clips:
+                        if not clip.future.done():
+                            clip.future.set_exception(e)
+                    continue
+                self.batches_run += 1
+                self.clips_batched += len(clips)
+                for clip, result in zip(clips, results):
+                    if not clip.future.done():
+                        clip.future.set_result(result)
+
+batch_scheduler = BatchScheduler(settings.BATCH_MAX_SIZE, settings.BATCH_MAX_WAIT_MS)
@@ -0,0 +1,171 @@
+import logging
+import numpy as np
+from typing import Iterable, Iterator, List, Optional, Tuple
+from app.core.config import settings
+from app.utils.file_utils import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# 30 ms analysis frames
+FRAME = SAMPLE_RATE * 30 // 1000
+# Keep a little audio either side of detected speech so word edges survive
+SPEECH_PAD_FRAMES = 10
+# Overlap kept around cuts that have to fall inside continuous speech
+FORCED_CUT_OVERLAP_FRAMES = SAMPLE_RATE // FRAME
+# Frame-energy percentiles taken as the noise floor and as the speech level; the
+# latter is high so speech still registers when it fills a few percent of the input
+NOISE_FLOOR_PERCENTILE = 10
+SPEECH_LEVEL_PERCENTILE = 99
+# Digital silence sits far below any real noise floor; never set the threshold under this
+MIN_THRESHOLD_DB = -70.0
+
+def frame_energy_db(audio: np.ndarray) -> np.ndarray:
+    """RMS energy per 30 ms frame in dBFS"""
+    full = len(audio) // FRAME
+    frames = audio[:full * FRAME].reshape(full, FRAME)
+    # einsum avoids materialising a squared copy of the whole buffer
+    power = np.einsum('ij,ij->i', frames, frames) / FRAME
+    if len(audio) % FRAME:
+        tail = audio[full * FRAME:]
+        power = np.append(power, np.dot(tail, tail) / len(tail))
+    return 10 * np.log10(power + 1e-10)
+
+def silence_threshold_db(energy: np.ndarray) -> float:
+    """Speech/silence threshold relative to the recording's own level.
+
+    SILENCE_MARGIN_DB above the noise floor, but at least that far below the
+    speech level, so quiet recordings and ones without pauses both work. The
+    cap only applies when the speech level stands out from the floor by more
+    than the margin; otherwise the "speech level" is noise too, and capping
+    would drop the threshold under the floor and mark all of it as speech.
+    """
+    floor, level = np.percentile(energy, [NOISE_FLOOR_PERCENTILE, SPEECH_LEVEL_PERCENTILE])
+    margin = settings.SILENCE_MARGIN_DB
+    threshold = max(floor + margin, MIN_THRESHOLD_DB)
+    if level - floor > margin:
+        threshold = min(threshold, level - margin)
+    return float(threshold)
+
+def _speech_spans(voiced: np.ndarray) -> List[List[int]]:
+    """Padded [start, end) frame ranges of detected speech"""
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], voiced.astype(np.int8), [0]])))
+    spans = []
+    for start, end in zip(edges[0::2], edges[1::2]):
+        start = max(0, int(start) - SPEECH_PAD_FRAMES)
+        end = min(len(voiced), int(end) + SPEECH_PAD_FRAMES)
+        if spans and start <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], end)
+        else:
+            spans.append([start, end])
+    return spans
+
+def plan_chunks(audio: np.ndarray, target: int, search: int,
+                threshold_db: Optional[float] = None) -> List[Tuple[int, int]]:
+    """Pick [start, end) sample ranges of at most `target` samples that cut inside silence.
+
+    Each chunk is closed at the last pause that keeps it under `target`, as long
+    as that pause is within `search` samples of the target length; otherwise it
+    is cut at the quietest frame in that window, with a one-second overlap.
+    Silences longer than SILENCE_SKIP_SECONDS are dropped entirely. Without
+    an explicit threshold_db it is derived from `audio` itself, and if no
+    frame clears it the whole input is kept.
+    """
+    if len(audio) == 0:
+        return []
+
+    energy = frame_energy_db(audio)
+    if threshold_db is None:
+        voiced = energy > silence_threshold_db(energy)
+        if not voiced.any():
+            voiced[:] = True
+    else:
+        voiced = energy > threshold_db
+    spans = _speech_spans(voiced)
+
+    target_frames = target // FRAME
+    search_frames = min(search // FRAME, target_frames // 2)
+    skip_frames = int(settings.SILENCE_SKIP_SECONDS * SAMPLE_RATE) // FRAME
+
+    chunks = []
+    start = end = None
+    for span_start, span_end in spans:
+        if start is not None and span_start - end >= skip_frames:
+            chunks.append((start, end))
+            start = None
+
+        if start is None:
+            start, end = span_start, span_end
+        elif span_end - start <= target_frames:
+            end = span_end
+        elif end - start >= target_frames - search_frames:
+            # The pause before this span is close enough to the target length
+            chunks.append((start, end))
+            start, end = span_start, span_end
+        else:
+            end = span_end
+
+        # Continuous speech longer than a chunk: cut at the quietest nearby frame
+        while end - start > target_frames:
+            window_start = start + target_frames - search_frames
+            cut = window_start + int(np.argmin(energy[window_start:start + target_frames]))
+            chunks.append((start, cut))
+            start = cut - FORCED_CUT_OVERLAP_FRAMES
+
+    if start is not None:
+        chunks.append((start, end))
+
+    return [(s * FRAME, min(e * FRAME, len(audio))) for s, e in chunks]
+
+def iter_speech_chunks(blocks: Iterable[np.ndarray], target: int, search: int) -> Iterator[Tuple[int, np.ndarray]]:
+    """Apply plan_chunks to a stream of PCM blocks, yielding (start_sample, chunk) as chunks settle.
+
+    The last planned chunk is held back until more audio arrives, and is
+    released once SILENCE_SKIP_SECONDS of silence follow it, since no later
+    speech can join it then; the buffer never grows much beyond one chunk,
+    one search window and one skip. The silence threshold comes from the
+    frame energies of everything read so far, so a window that is silent
+    throughout can still be skipped.
+    """
+    buffer = np.empty(0, dtype=np.float32)
+    base = 0
+    # Audio kept either side of a dropped silence so the next word is not clipped
+    keep = SPEECH_PAD_FRAMES * FRAME
+    skip = int(settings.SILENCE_SKIP_SECONDS * SAMPLE_RATE) // FRAME * FRAME
+    # One float per 30 ms frame: about 2 MB for the 4-hour limit
+    history = []
+    for block in blocks:
+        history.append(frame_energy_db(block).astype(np.float32))
+        buffer = np.concatenate([buffer, block])
+        if len(buffer) < target + search:
+            continue
+
+        planned = plan_chunks(buffer, target, search, silence_threshold_db(np.concatenate(history)))
+        if not planned:
+            # Nothing but silence so far; keep only enough to not clip the next word
+            base += len(buffer) - keep
+            buffer = buffer[-keep:].copy()
+            continue
+
+        for start, end in planned[:-1]:
+            yield base + start, buffer[start:end]
+        last_start, last_end = planned[-1]
+        if len(buffer) - last_end >= skip + keep:
+            # Speech after this much silence starts a new chunk, so the held one is final
+            yield base + last_start, buffer[last_start:last_end]
+            base += len(buffer) - keep
+            buffer = buffer[-keep:].copy()
+            continue
+        base += last_start
+        buffer = buffer[last_start:].copy()
+
+    if not history:
+        return
+    # A recording that never clears the threshold is kept whole rather than dropped
+    threshold = silence_threshold_db(np.concatenate(history))
+    final = plan_chunks(buffer, target, search, threshold) if base else plan_chunks(buffer, target, search)
+    for start, end in final:
+        yield base + start, buffer[start:end]
+
+def drop_overlapping_segments(segments: List[dict], covered_until: float) -> List[dict]:
+    """Drop segments already emitted by the previous chunk's overlap, judged by their midpoint"""
+    return [segment for segment in segments if (segment["start"] + segment["end"]) / 2 >= covered_until]
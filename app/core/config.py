@@ -13,20 +13,88 @@ class Settings:
     # Server Configuration
     HOST: str = "0.0.0.0"
     PORT: int = int(os.getenv("PORT", "8000"))
+    PREFORK_WORKERS: int = int(os.getenv("PREFORK_WORKERS", "0"))  # >0 = load once, fork workers sharing the weights
     
     # API Configuration
-    # DOCS_URL: str = "/docs"
-    # REDOC_URL: str = "/redoc"
+    DOCS_URL: str = "/docs"
+    REDOC_URL: str = "/redoc"
     # API_PREFIX: str = "/api/v1"
     
     # Model Configuration
     MODEL_SIZE: str = os.getenv("MODEL_SIZE", "small")
+    AVAILABLE_MODEL_SIZES: list = os.getenv("AVAILABLE_MODEL_SIZES", "tiny,base,small,medium").split(",")
+    MODEL_MEMORY_BUDGET_MB: int = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "4096"))
+    CPU_QUANTIZE: bool = os.getenv("CPU_QUANTIZE", "False").lower() == "true"  # int8 linear layers on CPU
+    TORCH_INTRA_OP_THREADS: int = int(os.getenv("TORCH_INTRA_OP_THREADS", "0"))  # 0 = torch default
+    TORCH_INTER_OP_THREADS: int = int(os.getenv("TORCH_INTER_OP_THREADS", "0"))  # 0 = torch default
+    MODEL_WARMUP: bool = os.getenv("MODEL_WARMUP", "True").lower() == "true"  # decode a silent clip before going ready
+    MODEL_WARMUP_SECONDS: int = 1
     MAX_FILE_SIZE: int = 100 * 1024 * 1024  # 100MB
+    UPLOAD_BLOCK_SIZE: int = 1024 * 1024  # 1MB
     CHUNK_DURATION_MINUTES: int = 10
     MAX_TOTAL_DURATION: int = 240 * 60  # 4 hours
+    CHUNK_SPLIT_MODE: str = os.getenv("CHUNK_SPLIT_MODE", "silence")  # "silence" or "fixed"
+    CHUNK_SEARCH_SECONDS: int = 30  # how far before the target length a silent cut may fall
+    SILENCE_MARGIN_DB: float = float(os.getenv("SILENCE_MARGIN_DB", "12"))  # above the recording's own noise floor
+    SILENCE_SKIP_SECONDS: float = float(os.getenv("SILENCE_SKIP_SECONDS", "10"))  # longer silences are not transcribed
+    STREAMING_DECODE_MIN_DURATION: int = int(os.getenv("STREAMING_DECODE_MIN_DURATION", str(30 * 60)))  # seconds
+    CHUNK_WORKERS: int = int(os.getenv("CHUNK_WORKERS", "0"))  # 0 = transcribe chunks sequentially
+    CHUNK_WORKER_THREADS: int = int(os.getenv("CHUNK_WORKER_THREADS", "0"))  # 0 = cpu_count / CHUNK_WORKERS
+    CHUNK_PIN_LANGUAGE: bool = os.getenv("CHUNK_PIN_LANGUAGE", "True").lower() == "true"  # detect once, on the first speech chunk
+    CHUNK_PROMPT_CHARS: int = int(os.getenv("CHUNK_PROMPT_CHARS", "200"))  # previous chunk's text tail as prompt; 0 = off
+    
+    # Job Queue
+    INFERENCE_WORKERS: int = int(os.getenv("INFERENCE_WORKERS", "2"))
+    JOB_QUEUE_SIZE: int = int(os.getenv("JOB_QUEUE_SIZE", "32"))
+    JOB_RESULT_TTL: int = int(os.getenv("JOB_RESULT_TTL", "3600"))  # seconds
+    JOB_MAX_RETAINED: int = int(os.getenv("JOB_MAX_RETAINED", "256"))  # finished jobs kept for GET /jobs/{id}
+    JOB_PRUNE_INTERVAL: int = 60  # seconds
+    # Pre-forked workers mirror POST /jobs statuses here, since a poll may reach any of them
+    JOB_STORE_PATH: str = os.getenv("JOB_STORE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "bloomnote", "jobs.sqlite3"))
+    
+    # Admission Control (costs are in probed audio duration, not requests)
+    ADMISSION_BUDGET_MINUTES: float = float(os.getenv("ADMISSION_BUDGET_MINUTES", "480"))  # audio in flight at once
+    ADMISSION_MAX_WAITING: int = int(os.getenv("ADMISSION_MAX_WAITING", "16"))
+    ADMISSION_MAX_WAIT_SECONDS: float = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "30"))
+    ADMISSION_INITIAL_RTF: float = float(os.getenv("ADMISSION_INITIAL_RTF", "0.5"))  # until jobs have been timed
+    ADMISSION_FALLBACK_BYTES_PER_SECOND: int = 16000  # cost estimate when ffprobe cannot read the duration
+    CLIENT_AUDIO_MINUTES_PER_HOUR: float = float(os.getenv("CLIENT_AUDIO_MINUTES_PER_HOUR", "600"))  # 0 = unlimited
+    
+    # Short-clip batching
+    BATCH_ENABLED: bool = os.getenv("BATCH_ENABLED", "True").lower() == "true"
+    BATCH_MAX_SIZE: int = int(os.getenv("BATCH_MAX_SIZE", "8"))
+    BATCH_MAX_WAIT_MS: int = int(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+    
+    # Live Transcription
+    LIVE_MODEL_SIZE: str = os.getenv("LIVE_MODEL_SIZE", "base")  # own model and lock; empty = share MODEL_SIZE
+    LIVE_MAX_SESSIONS: int = int(os.getenv("LIVE_MAX_SESSIONS", "4"))
+    LIVE_WORKERS: int = int(os.getenv("LIVE_WORKERS", "1"))
+    LIVE_STEP_SECONDS: float = float(os.getenv("LIVE_STEP_SECONDS", "2"))
+    LIVE_STABLE_MARGIN_SECONDS: float = 2.0
+    LIVE_MAX_BUFFER_SECONDS: float = 25.0
+    LIVE_MAX_BACKLOG_SECONDS: float = 60.0  # undecoded audio beyond this is dropped and the client told
+    
+    # Caching
+    CACHE_MAX_BYTES: int = int(os.getenv("CACHE_MAX_MB", "256")) * 1024 * 1024
+    CACHE_TTL_SECONDS: int = int(os.getenv("CACHE_TTL_SECONDS", "3600"))
+    DISK_CACHE_ENABLED: bool = os.getenv("DISK_CACHE_ENABLED", "True").lower() == "true"
+    DISK_CACHE_PATH: str = os.getenv("DISK_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "bloomnote", "transcriptions.sqlite3"))
+    DISK_CACHE_MAX_BYTES: int = int(os.getenv("DISK_CACHE_MAX_MB", "2048")) * 1024 * 1024
+    CHECKPOINTS_ENABLED: bool = os.getenv("CHECKPOINTS_ENABLED", "True").lower() == "true"  # per-chunk results of long files
+    CHECKPOINT_PATH: str = os.getenv("CHECKPOINT_PATH", os.path.join(os.path.expanduser("~"), ".cache", "bloomnote", "checkpoints.sqlite3"))
+    CHECKPOINT_TTL_HOURS: int = int(os.getenv("CHECKPOINT_TTL_HOURS", "24"))
+    AUDIO_FINGERPRINT_ENABLED: bool = os.getenv("AUDIO_FINGERPRINT_ENABLED", "False").lower() == "true"  # match re-encodes of cached audio
+    AUDIO_FINGERPRINT_PATH: str = os.getenv("AUDIO_FINGERPRINT_PATH", os.path.join(os.path.expanduser("~"), ".cache", "bloomnote", "fingerprints.sqlite3"))
+    AUDIO_FINGERPRINT_TTL_HOURS: int = int(os.getenv("AUDIO_FINGERPRINT_TTL_HOURS", str(30 * 24)))  # since last match
     
     # Rate Limiting
-    RATE_LIMIT: str = os.getenv("RATE_LIMIT", "10/minute")
+    RATE_LIMIT: str = os.getenv("RATE_LIMIT", "60/minute")  # request flood guard; audio volume is capped by CLIENT_AUDIO_MINUTES_PER_HOUR
+    # Pre-forked workers need counters they can all see; memory:// is per process
+    RATE_LIMIT_STORAGE_URI: str = os.getenv(
+        "RATE_LIMIT_STORAGE_URI",
+        "sqlite://" + os.path.join(os.path.expanduser("~"), ".cache", "bloomnote", "ratelimits.sqlite3")
+        if PREFORK_WORKERS > 0 else "memory://",
+    )
     
     # Supported Formats
     SUPPORTED_FORMATS: list = ['.wav', '.mp3', '.m4a', '.flac', '.ogg', '.aac', '.wma', '.mp4', '.m4v', '.mov']
@@ -0,0 +1,432 @@
+import asyncio
+import itertools
+import os
+import time
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Any, AsyncIterator, Awaitable, List, Optional, Tuple
+from app.core.config import settings
+from app.core.batching import batch_scheduler
+from app.core.admission import admission_controller
+from app.core.transcribe import load_audio_input, transcribe_input, build_response, shift_segments
+from app.utils.cache import get_cached_result, make_cache_key, store_cached_result
+from app.utils.checkpoints import checkpoint_store, make_checkpoint_prefix
+from app.utils.fingerprint import audio_fingerprint_id
+from app.utils.job_store import JobStore, job_store
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+class JobQueueFullError(Exception):
+    """Raised when the job queue cannot accept more work"""
+
+class JobCancelled(Exception):
+    """Raised in the inference thread to stop a job nobody is waiting for any more"""
+
+class TranscriptionJob:
+    """A queued transcription and its live status"""
+
+    def __init__(self, audio_path: str, filename: str, file_size: int, language: Optional[str] = None,
+                 task: str = "transcribe", cache_key: Optional[str] = None, stream: bool = False,
+                 model_size: Optional[str] = None, admitted_seconds: float = 0.0,
+                 content_hash: Optional[str] = None, fingerprint: bool = False,
+                 start: float = 0.0, end: Optional[float] = None, pollable: bool = False):
+        self.id = uuid.uuid4().hex
+        self.audio_path = audio_path
+        self.filename = filename
+        self.file_size = file_size
+        self.language = language
+        self.task = task
+        self.model_size = model_size
+        # Seconds of the original file to transcribe; end=None means to the end
+        self.start = start
+        self.end = end
+        self.ranged = bool(start) or end is not None
+        self.cache_key = cache_key
+        # Look the decoded audio up by fingerprint before inference; a match is a re-encode or
+        # re-tag of audio already transcribed. The key is also cached under once the job finishes.
+        self.fingerprint = fingerprint
+        self.fingerprint_key: Optional[str] = None
+        # Lets chunked transcriptions checkpoint per chunk and resume after a failure
+        self.checkpoint_prefix = make_checkpoint_prefix(content_hash, model_size, language, task, start, end) if content_hash else None
+        # Audio seconds reserved with the admission controller, returned when the job ends
+        self.admitted_seconds = admitted_seconds
+        # Streaming jobs push per-chunk events instead of accumulating segments
+        self.stream = stream
+        # Polled through GET /jobs/{id}, so its status is mirrored to the shared job store
+        self.pollable = pollable
+        self._versions = itertools.count(1)
+        self.events: Optional[asyncio.Queue] = asyncio.Queue() if stream else None
+        self._loop = asyncio.get_running_loop()
+
+        self.status = "queued"  # queued -> running -> completed | failed
+        # Set from the event loop when the caller goes away; checked between chunks
+        self.cancelled = False
+        self.completed_chunks = 0
+        self.total_chunks: Optional[int] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        # Seconds per pipeline stage, surfaced in the Server-Timing header
+        self.timings: Dict[str, float] = {}
+        self._done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def update_progress(self, completed: int, total: int):
+        """Progress hook, called from the inference thread"""
+        self.completed_chunks = completed
+        self.total_chunks = total
+
+    def publish_segments(self, chunk_index: int, segments: List[Dict[str, Any]], text: str):
+        """Segment hook, called from the inference thread as each chunk finishes"""
+        self._publish({
+            "type": "segments",
+            "chunk": chunk_index,
+            "total_chunks": self.total_chunks,
+            "text": text,
+            "segments": segments,
+        })
+
+    def _publish(self, event: Dict[str, Any]):
+        if self.events is not None and not self.cancelled:
+            self._loop.call_soon_threadsafe(self.events.put_nowait, event)
+
+    async def iter_events(self) -> AsyncIterator[Dict[str, Any]]:
+        """Yield streamed events until the final summary or error record"""
+        while True:
+            event = await self.events.get()
+            yield event
+            if event["type"] in ("summary", "error"):
+                return
+
+    async def wait(self) -> "TranscriptionJob":
+        """Wait for the job to finish without blocking the event loop"""
+        await self._done.wait()
+        return self
+
+    def failure_detail(self) -> Dict[str, Any]:
+        """Error payload telling the client how far the job got; chunks finish in order"""
+        return {
+            "message": f"Transcription failed: {self.error}",
+            "completed_chunks": self.completed_chunks,
+            "total_chunks": self.total_chunks,
+            # Finished chunks are checkpointed, so resubmitting the same file only redoes the rest
+            "resumable": self.checkpoint_prefix is not None and checkpoint_store is not None and self.completed_chunks > 0,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": {
+                "completed_chunks": self.completed_chunks,
+                "total_chunks": self.total_chunks,
+            },
+            "filename": self.filename,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+            "result": self.result,
+        }
+
+class JobManager:
+    """Bounded queue of transcription jobs drained by a fixed pool of inference workers"""
+
+    def __init__(self, workers: int, max_queue: int, result_ttl: int, max_retained: int,
+                 store: Optional[JobStore] = None):
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.result_ttl = timedelta(seconds=result_ttl)
+        self.max_retained = max_retained
+        self.jobs: Dict[str, TranscriptionJob] = {}
+        # Shared with the other pre-forked workers, which cannot see self.jobs
+        self.store = store
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks = []
+        # Batched jobs finishing after their worker moved on
+        self._background = set()
+
+    async def start(self):
+        """Start the worker pool on the running event loop"""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._prune_periodically()))
+        logger.info(f"👷 Started {self.workers} inference workers (queue size {self.max_queue})")
+        if settings.BATCH_ENABLED:
+            await batch_scheduler.start(self._executor)
+
+    async def stop(self):
+        """Cancel the workers and release the thread pool"""
+        await batch_scheduler.stop()
+        for task in self._tasks + list(self._background):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._background, return_exceptions=True)
+        self._tasks = []
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, job: TranscriptionJob) -> TranscriptionJob:
+        """Enqueue a job, raising JobQueueFullError if the queue is at capacity"""
+        if self._queue is None:
+            raise RuntimeError("Job manager not started")
+        self._prune()
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFullError("Too many queued transcriptions, try again later")
+        self.jobs[job.id] = job
+        self._save(job)
+        logger.info(f"📥 Queued job {job.id} ({self._queue.qsize()} waiting)")
+        return job
+
+    def get(self, job_id: str) -> Optional[TranscriptionJob]:
+        self._prune()
+        return self.jobs.get(job_id)
+
+    async def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a job run by this worker or, when pre-forked, by any other"""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.store is None:
+            return None
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    def forget(self, job_id: str):
+        """Drop a job whose caller has already received the result, e.g. from the synchronous endpoints"""
+        self.jobs.pop(job_id, None)
+
+    def cancel(self, job_id: str):
+        """Forget a job whose caller went away and, if unfinished, stop it.
+
+        A queued job is skipped; a running one stops publishing at once and
+        its inference is abandoned before the next chunk (finished chunks stay
+        checkpointed).
+        """
+        job = self.jobs.pop(job_id, None)
+        if job is None or job.finished:
+            return
+        job.cancelled = True
+        # Drop events already buffered for a reader that is gone
+        job.events = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def in_flight(self) -> Dict[str, int]:
+        """Number of unfinished jobs by status"""
+        counts = {"queued": 0, "running": 0}
+        for job in list(self.jobs.values()):
+            if job.status in counts:
+                counts[job.status] += 1
+        return counts
+
+    def _prune(self):
+        """Forget finished jobs older than the result TTL, then the oldest beyond max_retained"""
+        cutoff = datetime.now() - self.result_ttl
+        finished = sorted((job for job in self.jobs.values() if job.finished), key=lambda job: job.finished_at)
+        excess = len(finished) - self.max_retained
+        for i, job in enumerate(finished):
+            if i < excess or job.finished_at < cutoff:
+                del self.jobs[job.id]
+
+    def _save(self, job: TranscriptionJob):
+        """Mirror a pollable job's status to the store without blocking the event loop"""
+        if self.store is not None and job.pollable:
+            asyncio.get_running_loop().run_in_executor(None, self.store.set, job.id, next(job._versions),
+                                                       job.to_dict(), job.finished)
+
+    def _segment_hook(self, job: TranscriptionJob):
+        """Segment callback for the inference thread that aborts a cancelled job between chunks"""
+        def publish_segments(chunk_index: int, segments: List[Dict[str, Any]], text: str):
+            if job.cancelled:
+                raise JobCancelled("Cancelled, the client went away")
+            job.publish_segments(chunk_index, segments, text)
+        return publish_segments
+
+    def _progress_hook(self, job: TranscriptionJob):
+        """Progress callback for the inference thread, which can write to the store directly"""
+        if self.store is None or not job.pollable:
+            return job.update_progress
+
+        def update_progress(completed: int, total: int):
+            job.update_progress(completed, total)
+            self.store.set(job.id, next(job._versions), job.to_dict(), False)
+        return update_progress
+
+    async def _prune_periodically(self):
+        """Free results on an idle server too, not only when new jobs arrive"""
+        while True:
+            await asyncio.sleep(settings.JOB_PRUNE_INTERVAL)
+            self._prune()
+
+    async def _worker(self, index: int):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: TranscriptionJob):
+        loop = asyncio.get_running_loop()
+        if job.cancelled:
+            self._cancel(job)
+            return
+        job.status = "running"
+        job.started_at = datetime.now()
+        self._save(job)
+        logger.info(f"🎙️ Starting transcription for {job.filename}")
+        started = time.perf_counter()
+        try:
+            audio, duration = await loop.run_in_executor(self._executor, load_audio_input, job.audio_path,
+                                                         job.start, job.end)
+        except Exception as e:
+            self._fail(job, e, "decode")
+            return
+        job.timings["decode"] = time.perf_counter() - started
+        metrics.decode_seconds.observe(job.timings["decode"])
+        if job.cancelled:
+            self._cancel(job)
+            return
+
+        if job.fingerprint:
+            # Done here rather than on upload so the decode is paid for by the job's admission
+            cached_result = await self._match_fingerprint(job, audio)
+            if cached_result is not None:
+                await self._complete_cached(job, cached_result)
+                return
+
+        if batch_scheduler.accepts(audio):
+            # Hand the clip to the batcher so this worker can decode the next upload meanwhile
+            task = asyncio.create_task(self._finish(job, self._transcribe_batched(job, audio), duration, "batch"))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+            return
+
+        transcription = loop.run_in_executor(
+            self._executor,
+            transcribe_input,
+            job.audio_path,
+            audio,
+            duration,
+            job.language,
+            job.task,
+            self._progress_hook(job),
+            self._segment_hook(job) if job.stream else None,
+            not job.stream,
+            job.model_size,
+            job.checkpoint_prefix,
+            job.start,
+            job.end,
+        )
+        del audio
+        await self._finish(job, transcription, duration)
+
+    async def _match_fingerprint(self, job: TranscriptionJob, audio) -> Optional[Dict[str, Any]]:
+        """Cached result for audio matching the job's fingerprint, setting job.fingerprint_key on the way"""
+        started = time.perf_counter()
+        try:
+            fingerprint = await asyncio.get_running_loop().run_in_executor(
+                self._executor, audio_fingerprint_id, job.audio_path, audio)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not fingerprint job {job.id}: {e}")
+            return None
+        finally:
+            job.timings["fingerprint"] = time.perf_counter() - started
+            metrics.fingerprint_seconds.observe(job.timings["fingerprint"])
+        if fingerprint is None:
+            return None
+        job.fingerprint_key = make_cache_key(fingerprint, job.model_size, job.language, job.task)
+        return await get_cached_result(job.fingerprint_key)
+
+    async def _complete_cached(self, job: TranscriptionJob, result: Dict[str, Any]):
+        logger.info("♻️ Using cached transcription of matching audio")
+        job.result = result
+        job.update_progress(1, 1)
+        job.status = "completed"
+        if job.cache_key:
+            # Later uploads of these exact bytes can skip the decode
+            await store_cached_result(job.cache_key, result)
+        if job.stream:
+            job.publish_segments(0, result.get("segments", []), result["text"])
+        job._publish({"type": "summary", **{k: v for k, v in result.items() if k != "segments"}})
+        self._close(job)
+
+    async def _transcribe_batched(self, job: TranscriptionJob, audio) -> Tuple[Dict[str, Any], bool]:
+        result = await batch_scheduler.transcribe(audio, job.language, job.task, job.model_size)
+        shift_segments(result["segments"], job.start)
+        job.update_progress(1, 1)
+        if job.stream:
+            job.publish_segments(0, result["segments"], result["text"].strip())
+        return result, False
+
+    async def _finish(self, job: TranscriptionJob, transcription: Awaitable, duration: float,
+                      path: Optional[str] = None):
+        """Await the (result, chunked) transcription, then record, cache and publish the outcome"""
+        started = time.perf_counter()
+        try:
+            result, chunked = await transcription
+            job.timings["inference"] = time.perf_counter() - started
+            metrics.inference_seconds.observe(job.timings["inference"],
+                                              path=path or ("chunked" if chunked else "short"))
+            metrics.audio_seconds.observe(duration)
+            processing_seconds = (datetime.now() - job.started_at).total_seconds()
+            admission_controller.observe(processing_seconds, duration)
+            job.result = build_response(result, duration, chunked, job.filename, job.file_size, job.model_size,
+                                        processing_seconds, job.start if job.ranged else None)
+            logger.info("✅ Transcription completed")
+            job.status = "completed"
+            if job.cache_key and not job.stream:
+                await store_cached_result(job.cache_key, job.result)
+                if job.fingerprint_key:
+                    await store_cached_result(job.fingerprint_key, job.result)
+            job._publish({"type": "summary", **{k: v for k, v in job.result.items() if k != "segments"}})
+            self._close(job)
+        except JobCancelled:
+            self._cancel(job)
+        except Exception as e:
+            self._fail(job, e, "inference")
+
+    def _fail(self, job: TranscriptionJob, error: Exception, stage: str):
+        logger.error(f"❌ Job {job.id} failed: {str(error)}")
+        metrics.errors.inc(stage=stage)
+        job.status = "failed"
+        job.error = str(error)
+        detail = job.failure_detail()
+        job._publish({"type": "error", "detail": detail.pop("message"), **detail})
+        self._close(job)
+
+    def _cancel(self, job: TranscriptionJob):
+        logger.info(f"🛑 Job {job.id} cancelled, its client went away")
+        job.status = "failed"
+        job.error = "cancelled"
+        self._close(job)
+
+    def _close(self, job: TranscriptionJob):
+        admission_controller.release(job.admitted_seconds)
+        job.admitted_seconds = 0.0
+        job.finished_at = datetime.now()
+        job._done.set()
+        self._save(job)
+        if os.path.exists(job.audio_path):
+            try:
+                os.unlink(job.audio_path)
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to delete temp file: {e}")
+
+job_manager = JobManager(settings.INFERENCE_WORKERS, settings.JOB_QUEUE_SIZE, settings.JOB_RESULT_TTL,
+                         settings.JOB_MAX_RETAINED, job_store)
+metrics.jobs_in_flight.set_function(lambda: {(state,): n for state, n in job_manager.in_flight().items()})
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from app.core.config import settings
+from app.core.models import get_model, get_inference_lock
+from app.utils.file_utils import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# Live decodes get their own small pool so they cannot take upload workers
+live_executor = ThreadPoolExecutor(max_workers=max(1, settings.LIVE_WORKERS), thread_name_prefix="live")
+live_sessions = asyncio.Semaphore(settings.LIVE_MAX_SESSIONS)
+
+# Characters of finalized text fed back as the prompt for the next decode
+PROMPT_TAIL_CHARS = 200
+
+def get_live_model():
+    """Return (model, lock) used for live decoding.
+
+    A separate, smaller model (LIVE_MODEL_SIZE, "base" by default) keeps live
+    latency independent of long uploads holding the main model's lock.
+    Setting it empty shares the main model, and live decodes then queue
+    behind upload chunks.
+    """
+    size = settings.LIVE_MODEL_SIZE or None
+    return get_model(size), get_inference_lock(size)
+
+class LiveSession:
+    """Rolling audio buffer for one live connection.
+
+    Only the unstable tail (audio not yet covered by finalized segments) is
+    kept and re-decoded; segments ending more than LIVE_STABLE_MARGIN_SECONDS
+    before the end of the buffer are finalized and their audio dropped. If
+    decoding falls behind, audio older than LIVE_MAX_BACKLOG_SECONDS is
+    dropped and the next decode reports it in a "lagging" message.
+    """
+
+    def __init__(self, language: Optional[str] = None, task: str = "transcribe"):
+        self.language = language
+        self.task = task
+        self.buffer = np.empty(0, dtype=np.float32)
+        # Samples finalized or dropped from the front of the buffer
+        self.trimmed_samples = 0
+        self.pending_samples = 0
+        # Samples dropped because decoding fell behind, not yet reported to the client
+        self.dropped_samples = 0
+        self.ended = False
+        self.finalized_text = ""
+        # append() runs on the event loop while decode() trims from a live worker
+        self._lock = threading.Lock()
+
+    def append(self, pcm: bytes):
+        """Add 16 kHz mono s16le PCM from the client"""
+        samples = np.frombuffer(pcm[:len(pcm) - len(pcm) % 2], np.int16).astype(np.float32) / 32768.0
+        with self._lock:
+            self.buffer = np.concatenate([self.buffer, samples])
+            self.pending_samples += len(samples)
+            excess = len(self.buffer) - int(settings.LIVE_MAX_BACKLOG_SECONDS * SAMPLE_RATE)
+            if excess > 0:
+                self.buffer = self.buffer[excess:].copy()
+                self.trimmed_samples += excess
+                self.dropped_samples += excess
+
+    @property
+    def offset(self) -> float:
+        """Position of the buffer's first sample on the session timeline, in seconds"""
+        return self.trimmed_samples / SAMPLE_RATE
+
+    def ready(self) -> bool:
+        """Whether enough new audio has arrived to be worth another decode"""
+        return self.ended or self.pending_samples >= settings.LIVE_STEP_SECONDS * SAMPLE_RATE
+
+    def decode(self) -> List[Dict[str, Any]]:
+        """Re-decode the unstable tail and return the messages to push to the client"""
+        with self._lock:
+            self.pending_samples = 0
+            buffer = self.buffer
+            # Where this snapshot starts; append() may trim the live buffer while we decode
+            base = self.trimmed_samples
+            dropped, self.dropped_samples = self.dropped_samples, 0
+        messages = []
+        if dropped:
+            messages.append({"type": "lagging", "dropped_seconds": round(dropped / SAMPLE_RATE, 2)})
+        if len(buffer) == 0:
+            return messages
+
+        model, lock = get_live_model()
+        options = {
+            "fp16": False,
+            "language": self.language,
+            "task": self.task,
+            "condition_on_previous_text": False,
+            "initial_prompt": self.finalized_text[-PROMPT_TAIL_CHARS:] or None,
+        }
+        options = {k: v for k, v in options.items() if v is not None}
+
+        with lock:
+            result = model.transcribe(buffer, **options)
+        if self.language is None:
+            # Pin the detected language so later decodes skip detection
+            self.language = result.get("language")
+
+        segments = result["segments"]
+        buffer_seconds = len(buffer) / SAMPLE_RATE
+        if self.ended:
+            stable = segments
+        else:
+            stable_until = buffer_seconds - settings.LIVE_STABLE_MARGIN_SECONDS
+            stable = [s for s in segments[:-1] if s["end"] <= stable_until]
+            if not stable and buffer_seconds > settings.LIVE_MAX_BUFFER_SECONDS:
+                # Bound per-session compute: never let the tail outgrow one decode window
+                stable = segments
+        unstable = segments[len(stable):]
+
+        cut = None
+        base_seconds = base / SAMPLE_RATE
+        if stable:
+            cut = stable[-1]["end"]
+            final_segments = [
+                {"start": base_seconds + s["start"], "end": base_seconds + s["end"], "text": s["text"].strip()}
+                for s in stable
+            ]
+            text = " ".join(s["text"] for s in final_segments)
+            self.finalized_text = f"{self.finalized_text} {text}".strip()
+            messages.append({"type": "final", "text": text, "segments": final_segments})
+        elif not segments and buffer_seconds > settings.LIVE_STABLE_MARGIN_SECONDS:
+            # Nothing but silence: drop it, keeping the margin in case a word is starting
+            cut = buffer_seconds - settings.LIVE_STABLE_MARGIN_SECONDS
+
+        if cut is not None:
+            # Keep only the audio after the cut, including anything appended meanwhile;
+            # part of it may already have been dropped by append()
+            with self._lock:
+                remaining = base + int(cut * SAMPLE_RATE) - self.trimmed_samples
+                if remaining > 0:
+                    self.buffer = self.buffer[remaining:].copy()
+                    self.trimmed_samples += remaining
+
+        if unstable and not self.ended:
+            messages.append({
+                "type": "partial",
+                "text": "".join(s["text"] for s in unstable).strip(),
+                "start": self.offset,
+                "end": self.offset + len(self.buffer) / SAMPLE_RATE,
+            })
+        return messages
@@ -1,38 +1,292 @@
-import whisper
-import torch
+import asyncio
 import logging
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
 from app.core.config import settings
+from app.utils.file_utils import SAMPLE_RATE
+from app.utils import metrics
 
 logger = logging.getLogger(__name__)
 
-# Global model instance
+# Global model instance (the default MODEL_SIZE)
 model = None
 
+# Lifecycle of the default model: "loading" -> "warming" -> "ready", or "failed"
+model_status = "loading"
+model_error: Optional[str] = None
+model_load_seconds: Optional[float] = None
+
+# Background task loading the default model, started by start_model_loading()
+_load_task: Optional[asyncio.Task] = None
+
+def _device() -> str:
+    import torch
+
+    # Use GPU if available, otherwise CPU
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def model_memory_bytes(loaded_model) -> int:
+    """Bytes held by a model's parameters and buffers"""
+    tensors = list(loaded_model.parameters()) + list(loaded_model.buffers())
+    size = sum(t.numel() * t.element_size() for t in tensors)
+    # Dynamically quantized linears keep their packed int8 weights outside parameters()
+    for module in loaded_model.modules():
+        if hasattr(module, "_packed_params"):
+            weight, bias = module._packed_params._weight_bias()
+            size += weight.numel() * weight.element_size()
+            size += bias.numel() * bias.element_size() if bias is not None else 0
+    return size
+
+# Parameter counts of the stock Whisper sizes, to make room for a model before loading it
+MODEL_PARAMETERS = {
+    "tiny": 39_000_000,
+    "base": 74_000_000,
+    "small": 244_000_000,
+    "medium": 769_000_000,
+    "turbo": 809_000_000,
+    "large": 1_550_000_000,
+}
+
+def estimated_load_bytes(size: str) -> int:
+    """Peak bytes of loading a size: whisper loads fp32 weights, quantization happens after"""
+    name = size.split(".")[0]
+    name = "large" if name.startswith("large") else name
+    return MODEL_PARAMETERS.get(name, 0) * 4
+
+def configure_torch_threads():
+    """Apply TORCH_INTRA_OP_THREADS / TORCH_INTER_OP_THREADS to this process"""
+    import torch
+
+    if settings.TORCH_INTRA_OP_THREADS > 0:
+        torch.set_num_threads(settings.TORCH_INTRA_OP_THREADS)
+    if settings.TORCH_INTER_OP_THREADS > 0:
+        try:
+            torch.set_num_interop_threads(settings.TORCH_INTER_OP_THREADS)
+        except RuntimeError:
+            # Only settable before the first parallel op runs in this process
+            logger.warning("⚠️ Inter-op thread count already fixed, ignoring TORCH_INTER_OP_THREADS")
+    logger.info(f"🧵 Torch threads: intra-op {torch.get_num_threads()}, inter-op {torch.get_num_interop_threads()}")
+
+def quantize_for_cpu(loaded_model):
+    """Dynamic int8 quantization of a CPU model's linear layers (no-op elsewhere)"""
+    if not settings.CPU_QUANTIZE or loaded_model.device.type != "cpu":
+        return loaded_model
+    import torch
+    import whisper
+
+    # whisper.model.Linear only overrides forward() to cast weights; quantize_dynamic
+    # matches modules by exact type, so turn them back into plain nn.Linear first
+    for module in loaded_model.modules():
+        if type(module) is whisper.model.Linear:
+            module.__class__ = torch.nn.Linear
+    quantized = torch.quantization.quantize_dynamic(loaded_model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    quantized.quantized = True
+    return quantized
+
+def _load_model(size: str, device: str):
+    import whisper
+
+    return quantize_for_cpu(whisper.load_model(size, device=device))
+
+def is_quantized(loaded_model) -> bool:
+    return getattr(loaded_model, "quantized", False)
+
+class ModelRegistry:
+    """Whisper models loaded on demand and kept under a memory budget.
+
+    Concurrent first requests for the same size share one load. Before a
+    load, least recently used models are dropped until the incoming one's
+    estimated size fits the budget, so peak memory stays within it; the
+    default MODEL_SIZE and pinned sizes are never evicted.
+    """
+
+    def __init__(self, budget_bytes: int, default_size: str):
+        self.budget_bytes = budget_bytes
+        self.default_size = default_size
+        self.pinned: set = set()
+        self._models: "OrderedDict[str, Any]" = OrderedDict()
+        self._costs: Dict[str, int] = {}
+        # Whisper installs its kv-cache hooks on the shared model for every decode,
+        # so two concurrent transcribe() calls on the same instance corrupt each other.
+        self._inference_locks: Dict[str, threading.Lock] = {}
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def is_loaded(self, size: Optional[str] = None) -> bool:
+        return (size or self.default_size) in self._models
+
+    def get(self, size: Optional[str] = None):
+        """Return the model for a size, loading it first if needed (blocking)"""
+        size = size or self.default_size
+        with self._lock:
+            if size in self._models:
+                self._models.move_to_end(size)
+                return self._models[size]
+            load_lock = self._load_locks.setdefault(size, threading.Lock())
+
+        with load_lock:
+            # Another caller may have finished loading while we waited
+            with self._lock:
+                if size in self._models:
+                    self._models.move_to_end(size)
+                    return self._models[size]
+
+            with self._lock:
+                self._evict_locked(keep=size, incoming=estimated_load_bytes(size))
+            device = _device()
+            logger.info(f"📥 Loading Whisper model '{size}' on {device}...")
+            loaded = _load_model(size, device)
+            self.register(size, loaded)
+            logger.info(f"✅ Whisper model '{size}' loaded successfully!"
+                        f"{' (int8 quantized)' if is_quantized(loaded) else ''}")
+            return loaded
+
+    def register(self, size: str, loaded_model):
+        """Make an already-built model resident under a size name"""
+        cost = model_memory_bytes(loaded_model)
+        with self._lock:
+            self._models[size] = loaded_model
+            self._models.move_to_end(size)
+            self._costs[size] = cost
+            self._inference_locks.setdefault(size, threading.Lock())
+            self._evict_locked(keep=size)
+
+    def device_of(self, size: Optional[str] = None) -> str:
+        """Device a model runs on, without loading it"""
+        loaded = self._models.get(size or self.default_size)
+        if loaded is None:
+            return _device()
+        return "cuda" if loaded.device.type == "cuda" else "cpu"
+
+    def quantized(self, size: Optional[str] = None) -> bool:
+        """Whether a resident model runs with int8 linear layers"""
+        loaded = self._models.get(size or self.default_size)
+        return loaded is not None and is_quantized(loaded)
+
+    def lock_for(self, size: Optional[str] = None) -> threading.Lock:
+        """Lock serializing inference on one model instance"""
+        with self._lock:
+            return self._inference_locks.setdefault(size or self.default_size, threading.Lock())
+
+    def resident(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "model_size": size,
+                    "memory_mb": round(self._costs[size] / 1024 / 1024, 1),
+                    "device": self.device_of(size),
+                    "quantized": is_quantized(self._models[size]),
+                    "default": size == self.default_size,
+                }
+                for size in self._models
+            ]
+
+    def costs(self) -> Dict[str, int]:
+        """Memory per resident model size, in bytes"""
+        with self._lock:
+            return dict(self._costs)
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(self._costs.values())
+
+    def _evict_locked(self, keep: str, incoming: int = 0):
+        for size in list(self._models):
+            if self.resident_bytes + incoming <= self.budget_bytes:
+                break
+            if size in (keep, self.default_size) or size in self.pinned:
+                continue
+            # In-flight decodes keep their reference; memory is freed once they finish
+            del self._models[size]
+            freed = self._costs.pop(size)
+            logger.info(f"♻️ Evicted Whisper model '{size}' ({freed / 1024 / 1024:.0f}MB)")
+
+registry = ModelRegistry(settings.MODEL_MEMORY_BUDGET_MB * 1024 * 1024, settings.MODEL_SIZE)
+metrics.model_memory_bytes.set_function(lambda: {(size,): cost for size, cost in registry.costs().items()})
+
+def _load_default_model():
+    """Blocking part of startup: import torch/whisper, load and optionally warm up"""
+    global model, model_status
+    import torch
+
+    device = _device()
+    logger.info(f"🔧 Using device: {device}")
+
+    if device == "cuda":
+        logger.info(f"🎯 GPU: {torch.cuda.get_device_name()}")
+        logger.info(f"💾 GPU Memory: {torch.cuda.get_device_properties(0).total_memory / 1024**3:.1f}GB")
+    else:
+        configure_torch_threads()
+
+    # Load the model
+    loaded = registry.get(settings.MODEL_SIZE)
+    if settings.LIVE_MODEL_SIZE and settings.LIVE_MODEL_SIZE != settings.MODEL_SIZE:
+        # Live sessions should never wait on a cold load or an eviction
+        registry.pinned.add(settings.LIVE_MODEL_SIZE)
+        registry.get(settings.LIVE_MODEL_SIZE)
+
+    if settings.MODEL_WARMUP:
+        # First decode pays for kernel selection and allocator growth; do it before taking traffic
+        model_status = "warming"
+        started = time.perf_counter()
+        with registry.lock_for(settings.MODEL_SIZE):
+            loaded.transcribe(np.zeros(settings.MODEL_WARMUP_SECONDS * SAMPLE_RATE, dtype=np.float32), fp16=False)
+        logger.info(f"🔥 Warm-up inference took {time.perf_counter() - started:.1f}s")
+    model = loaded
+
 async def load_whisper_model():
-    """Load the Whisper model on startup"""
-    global model
+    """Load the Whisper model off the event loop and record its status"""
+    global model, model_status, model_error, model_load_seconds
+    model_status = "loading"
+    model_error = None
+    started = time.perf_counter()
     try:
         logger.info("📥 Loading Whisper model...")
-        
-        # Use GPU if available, otherwise CPU
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        logger.info(f"🔧 Using device: {device}")
-        
-        if device == "cuda":
-            logger.info(f"🎯 GPU: {torch.cuda.get_device_name()}")
-            logger.info(f"💾 GPU Memory: {torch.cuda.get_device_properties(0).total_memory / 1024**3:.1f}GB")
-        
-        # Load the model
-        model = whisper.load_model(settings.MODEL_SIZE, device=device)
-        logger.info(f"✅ Whisper model '{settings.MODEL_SIZE}' loaded successfully!")
-        
+        await asyncio.to_thread(_load_default_model)
+        model_load_seconds = round(time.perf_counter() - started, 1)
+        model_status = "ready"
+        logger.info(f"✅ Model ready after {model_load_seconds}s")
+
     except Exception as e:
         logger.error(f"❌ Failed to load model: {str(e)}", exc_info=True)
         model = None
+        model_status = "failed"
+        model_error = str(e)
         raise e
 
-def get_model():
-    """Get the loaded model instance"""
+def set_default_model(loaded_model):
+    """Install an already-built model as the default and mark the service ready"""
+    global model, model_status, model_error
+    registry.register(settings.MODEL_SIZE, loaded_model)
+    model = loaded_model
+    model_status = "ready"
+    model_error = None
+
+def start_model_loading() -> Optional[asyncio.Task]:
+    """Start loading the model in the background so the server can bind right away"""
+    global _load_task
+    if is_model_ready():
+        # Already installed, e.g. by set_default_model()
+        return _load_task
+    if _load_task is None or _load_task.done():
+        _load_task = asyncio.create_task(load_whisper_model())
+        # The failure is already logged and kept in model_status; don't warn about it again
+        _load_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+    return _load_task
+
+def is_model_ready() -> bool:
+    return model_status == "ready" and model is not None
+
+def get_model(size: Optional[str] = None):
+    """Get a loaded model instance, loading non-default sizes on demand"""
+    if size and size != settings.MODEL_SIZE:
+        return registry.get(size)
     if model is None:
         raise RuntimeError("Model not loaded. Please wait for startup to complete.")
-    return model
\ No newline at end of file
+    return registry.get(settings.MODEL_SIZE)
+
+def get_inference_lock(size: Optional[str] = None) -> threading.Lock:
+    return registry.lock_for(size)
@@ -0,0 +1,87 @@
+import os
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from typing import Dict, Any, Optional
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Per-process models by size: the pool's default one, loaded by the initializer,
+# plus at most one other, so each worker holds no more than two model copies
+_worker_models: Dict[str, Any] = {}
+_default_size: Optional[str] = None
+
+# Shared pool, created on first use
+_chunk_pool: Optional[ProcessPoolExecutor] = None
+
+def _load_model(model_size: str):
+    import torch
+    import whisper
+    from app.core.models import quantize_for_cpu
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    return quantize_for_cpu(whisper.load_model(model_size, device=device))
+
+def _worker_model(model_size: str):
+    """Load (once per process) a private model copy in a pool worker"""
+    if model_size not in _worker_models:
+        # Drop the previous non-default size before loading, so two never overlap in memory
+        for size in [size for size in _worker_models if size != _default_size]:
+            del _worker_models[size]
+            logger.info(f"♻️ Chunk worker {os.getpid()} dropped Whisper model '{size}'")
+        _worker_models[model_size] = _load_model(model_size)
+    return _worker_models[model_size]
+
+def _init_worker(model_size: str, num_threads: int):
+    """Cap intra-op threads and preload the default model in a pool worker"""
+    global _default_size
+    import torch
+
+    torch.set_num_threads(num_threads)
+    _default_size = model_size
+    _worker_model(model_size)
+    logger.info(f"🧵 Chunk worker {os.getpid()} ready ({num_threads} threads)")
+
+def transcribe_chunk_in_worker(chunk: np.ndarray, options: Dict[str, Any], model_size: str) -> Dict[str, Any]:
+    """Transcribe one 16 kHz PCM chunk inside a pool worker"""
+    started = time.perf_counter()
+    result = _worker_model(model_size).transcribe(chunk, **options)
+    return {
+        "text": result["text"],
+        "segments": result["segments"],
+        "language": result.get("language"),
+        "inference_seconds": time.perf_counter() - started,
+    }
+
+def worker_threads() -> int:
+    """Intra-op threads per chunk worker so workers x threads fits the machine"""
+    if settings.CHUNK_WORKER_THREADS > 0:
+        return settings.CHUNK_WORKER_THREADS
+    return max(1, (os.cpu_count() or 1) // max(1, settings.CHUNK_WORKERS))
+
+def get_chunk_pool() -> Optional[ProcessPoolExecutor]:
+    """Return the chunk process pool, or None when parallel chunking is disabled"""
+    global _chunk_pool
+    if settings.CHUNK_WORKERS <= 0:
+        return None
+    if _chunk_pool is None:
+        threads = worker_threads()
+        logger.info(f"🚀 Starting {settings.CHUNK_WORKERS} chunk workers with {threads} threads each")
+        # spawn, not fork: forking a process that already initialised torch/OpenMP can deadlock
+        _chunk_pool = ProcessPoolExecutor(
+            max_workers=settings.CHUNK_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(settings.MODEL_SIZE, threads),
+        )
+    return _chunk_pool
+
+def shutdown_chunk_pool():
+    """Stop the chunk workers if they were started"""
+    global _chunk_pool
+    if _chunk_pool is not None:
+        _chunk_pool.shutdown(wait=False, cancel_futures=True)
+        _chunk_pool = None
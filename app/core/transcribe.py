@@ -1,92 +1,368 @@
-import tempfile
-import os
-import uuid
 import logging
-from pydub import AudioSegment
-from typing import Dict, Any, Optional
-from app.core.models import get_model
+import numpy as np
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Callable, Tuple
+from app.core.models import get_model, get_inference_lock, registry
+from app.core.parallel import get_chunk_pool, transcribe_chunk_in_worker
 from app.core.config import settings
+from app.core.chunking import plan_chunks, iter_speech_chunks, drop_overlapping_segments
+from app.utils.file_utils import decode_audio, iter_audio_windows, iter_pcm_blocks, probe_duration, SAMPLE_RATE
+from app.utils import metrics
+from app.utils.checkpoints import checkpoint_store, checkpoint_key
 
 logger = logging.getLogger(__name__)
 
-def transcribe_large_audio(audio_path: str, language: Optional[str] = None, task: str = "transcribe") -> Dict[str, Any]:
+ProgressCallback = Callable[[int, int], None]
+# (chunk index, offset-corrected segments, chunk text)
+SegmentCallback = Callable[[int, List[Dict[str, Any]], str], None]
+
+def transcribe_large_audio(audio: np.ndarray, language: Optional[str] = None, task: str = "transcribe",
+                           progress_callback: Optional[ProgressCallback] = None,
+                           segment_callback: Optional[SegmentCallback] = None,
+                           keep_segments: bool = True, model_size: Optional[str] = None,
+                           checkpoint_prefix: Optional[str] = None, time_offset: float = 0.0) -> Dict[str, Any]:
     """Transcribe long audio in chunks and combine results seamlessly"""
     try:
-        model = get_model()
-        audio = AudioSegment.from_file(audio_path)
-        total_duration_ms = len(audio)
-        total_duration_minutes = total_duration_ms / 1000 / 60
-        
-        logger.info(f"📊 Audio length: {total_duration_minutes:.1f} minutes")
-        
-        # Safety limit
-        if total_duration_ms > settings.MAX_TOTAL_DURATION * 1000:
-            raise ValueError(f"Audio too long: {total_duration_minutes:.1f} minutes exceeds maximum {settings.MAX_TOTAL_DURATION/60:.1f} minutes")
-        
-        chunk_length_ms = settings.CHUNK_DURATION_MINUTES * 60 * 1000
-        chunks = []
-        
-        # Split audio into chunks with 1-second overlap
-        for i in range(0, total_duration_ms, chunk_length_ms - 1000):
-            chunk_end = min(i + chunk_length_ms, total_duration_ms)
-            chunk = audio[i:chunk_end]
-            chunks.append(chunk)
-        
-        logger.info(f"📦 Splitting into {len(chunks)} chunks...")
-        
-        all_segments = []
-        full_text = []
-        
-        for i, chunk in enumerate(chunks):
-            chunk_start_minutes = (i * (chunk_length_ms - 1000)) / 1000 / 60
-            logger.info(f"🔊 Processing chunk {i+1}/{len(chunks)}...")
-            
-            chunk_path = f"temp_chunk_{i}_{uuid.uuid4().hex}.wav"
-            chunk.export(chunk_path, format="wav")
-            
-            # Transcribe chunk
-            options = {
-                "fp16": False,
-                "language": language,
-                "task": task
-            }
-            options = {k: v for k, v in options.items() if v is not None}
-            
-            result = model.transcribe(chunk_path, **options)
-            
-            # Adjust timestamps for chunk position
-            chunk_offset = i * ((chunk_length_ms - 1000) / 1000)
-            for segment in result["segments"]:
-                segment["start"] += chunk_offset
-                segment["end"] += chunk_offset
-                all_segments.append(segment)
-            
-            full_text.append(result["text"].strip())
-            
-            # Cleanup chunk file
-            os.remove(chunk_path)
-        
-        combined_text = " ".join(full_text)
-        logger.info(f"✅ Successfully processed {total_duration_minutes:.1f} minutes of audio")
-        
-        return {
-            "text": combined_text,
-            "segments": all_segments,
-            "language": result.get("language", "unknown")
-        }
-        
+        total_samples = len(audio)
+        _check_duration(total_samples / SAMPLE_RATE)
+
+        chunk_length, step = _chunk_geometry()
+
+        # Chunk slices are views into the decoded buffer, not copies
+        if settings.CHUNK_SPLIT_MODE == "silence":
+            spans = plan_chunks(audio, chunk_length, settings.CHUNK_SEARCH_SECONDS * SAMPLE_RATE)
+            voiced_minutes = sum(end - start for start, end in spans) / SAMPLE_RATE / 60
+            logger.info(f"🔇 Silence-aware split keeps {voiced_minutes:.1f} of {total_samples / SAMPLE_RATE / 60:.1f} minutes")
+            chunks = ((start, audio[start:end]) for start, end in spans)
+            total_chunks = len(spans)
+        else:
+            # Fixed chunks with 1-second overlap
+            chunks = ((i, audio[i:i + chunk_length]) for i in range(0, total_samples, step))
+            total_chunks = len(range(0, total_samples, step))
+
+        logger.info(f"📦 Splitting into {total_chunks} chunks...")
+
+        return _transcribe_chunks(chunks, total_chunks, language, task, progress_callback, segment_callback,
+                                  keep_segments, model_size, checkpoint_prefix, time_offset)
+
     except Exception as e:
         logger.error(f"❌ Chunked transcription failed: {e}")
         raise e
 
-def transcribe_short_audio(audio_path: str, language: Optional[str] = None, task: str = "transcribe") -> Dict[str, Any]:
+def transcribe_audio_stream(input_path: str, duration: float, language: Optional[str] = None, task: str = "transcribe",
+                            progress_callback: Optional[ProgressCallback] = None,
+                            segment_callback: Optional[SegmentCallback] = None,
+                            keep_segments: bool = True, model_size: Optional[str] = None,
+                            checkpoint_prefix: Optional[str] = None, start: float = 0.0,
+                            end: Optional[float] = None) -> Dict[str, Any]:
+    """Transcribe long audio, or its start-end range, by pulling one chunk window at a time from ffmpeg"""
+    try:
+        _check_duration(duration)
+
+        chunk_length, step = _chunk_geometry()
+        if settings.CHUNK_SPLIT_MODE == "silence":
+            search = settings.CHUNK_SEARCH_SECONDS * SAMPLE_RATE
+            chunks = iter_speech_chunks(iter_pcm_blocks(input_path, search, start, end), chunk_length, search)
+        else:
+            chunks = iter_audio_windows(input_path, chunk_length, step, start, end)
+        # Estimate only: silence skipping can make the real count lower
+        total_chunks = len(range(0, int(duration * SAMPLE_RATE), step))
+
+        logger.info(f"🌊 Streaming {total_chunks} chunks...")
+
+        return _transcribe_chunks(chunks, total_chunks, language, task, progress_callback, segment_callback,
+                                  keep_segments, model_size, checkpoint_prefix, start)
+
+    except Exception as e:
+        logger.error(f"❌ Streaming transcription failed: {e}")
+        raise e
+
+def _check_duration(duration: float):
+    """Safety limit"""
+    total_duration_minutes = duration / 60
+    logger.info(f"📊 Audio length: {total_duration_minutes:.1f} minutes")
+    if duration > settings.MAX_TOTAL_DURATION:
+        raise ValueError(f"Audio too long: {total_duration_minutes:.1f} minutes exceeds maximum {settings.MAX_TOTAL_DURATION/60:.1f} minutes")
+
+def _chunk_geometry() -> Tuple[int, int]:
+    """Chunk length and stride in samples (chunks overlap by one second)"""
+    chunk_length = settings.CHUNK_DURATION_MINUTES * 60 * SAMPLE_RATE
+    return chunk_length, chunk_length - SAMPLE_RATE
+
+def _transcribe_chunks(chunks: Iterable[Tuple[int, np.ndarray]], total_chunks: int, language: Optional[str],
+                       task: str, progress_callback: Optional[ProgressCallback] = None,
+                       segment_callback: Optional[SegmentCallback] = None,
+                       keep_segments: bool = True, model_size: Optional[str] = None,
+                       checkpoint_prefix: Optional[str] = None, time_offset: float = 0.0) -> Dict[str, Any]:
+    """Transcribe (start_sample, audio) chunks in order and merge them onto one timeline.
+
+    Each chunk's segments are handed to segment_callback as soon as it is done;
+    with keep_segments=False they are not accumulated in the returned result.
+    Without a language, the one detected on the first chunk with speech is
+    pinned for the rest; sequentially transcribed chunks are prompted with
+    the tail of the previous chunk's text.
+    With a checkpoint_prefix, finished chunks are persisted and chunks already
+    checkpointed by an earlier attempt are reused instead of transcribed.
+    time_offset (seconds) places the timeline in the original file when only
+    a range of it was decoded.
+    """
+    all_segments = []
+    full_text = []
+    result = {}
+    resumed_chunks = 0
+    # End of the timeline already covered, for reconciling overlapping chunks
+    covered_until = 0.0
+
+    # Decoding options shared by every chunk
+    options = {
+        "fp16": False,
+        "language": language,
+        "task": task
+    }
+    options = {k: v for k, v in options.items() if v is not None}
+
+    use_checkpoints = checkpoint_prefix is not None and checkpoint_store is not None
+    chunks = _attach_checkpoints(chunks, checkpoint_prefix if use_checkpoints else None)
+
+    # Both dispatchers read `options` lazily, so updates made below reach the chunks not yet started
+    pin_language = settings.CHUNK_PIN_LANGUAGE and "language" not in options
+    chunk_pool = get_chunk_pool()
+    if chunk_pool is not None:
+        results = _transcribe_chunks_parallel(chunk_pool, chunks, options, model_size)
+    else:
+        results = _transcribe_chunks_sequential(model_size, chunks, options)
+
+    for i, (chunk_start, key, result, resumed) in enumerate(results):
+        if resumed:
+            resumed_chunks += 1
+        elif key is not None:
+            # Persist before the offset is applied, so the row only depends on the chunk itself
+            _save_checkpoint(key, result)
+
+        # Adjust timestamps for chunk position
+        shift_segments(result["segments"], time_offset + chunk_start / SAMPLE_RATE)
+
+        segments = drop_overlapping_segments(result["segments"], covered_until)
+        if len(segments) == len(result["segments"]):
+            chunk_text = result["text"].strip()
+        else:
+            chunk_text = "".join(segment["text"] for segment in segments).strip()
+        if segments:
+            covered_until = segments[-1]["end"]
+
+        if keep_segments:
+            all_segments.extend(segments)
+        if chunk_text:
+            full_text.append(chunk_text)
+            if pin_language and result.get("language"):
+                options["language"] = result["language"]
+                pin_language = False
+                logger.info(f"🌐 Detected language '{result['language']}' on chunk {i+1}, pinned for the rest")
+            if chunk_pool is None:
+                _update_prompt(options, chunk_text, segments)
+
+        if progress_callback:
+            progress_callback(i + 1, max(total_chunks, i + 1))
+
+        if segment_callback:
+            segment_callback(i, segments, chunk_text)
+
+    combined_text = " ".join(full_text)
+    logger.info(f"✅ Successfully processed {len(full_text)} chunks")
+    if resumed_chunks:
+        logger.info(f"♻️ Reused {resumed_chunks} checkpointed chunks")
+
+    return {
+        "text": combined_text,
+        "segments": all_segments,
+        "language": options.get("language") or result.get("language", "unknown"),
+        "resumed_chunks": resumed_chunks,
+    }
+
+def _update_prompt(options: Dict[str, Any], chunk_text: str, segments: List[Dict[str, Any]]):
+    """Prompt the next chunk with the end of this one's text, as Whisper does between its own windows"""
+    if settings.CHUNK_PROMPT_CHARS <= 0:
+        return
+    # Whisper drops its prompt after a high-temperature fallback; do the same so a hallucinated
+    # repetition is not fed into the next chunk
+    if segments and segments[-1].get("temperature", 0.0) > 0.5:
+        options.pop("initial_prompt", None)
+        return
+    tail = chunk_text[-settings.CHUNK_PROMPT_CHARS:]
+    if len(chunk_text) > settings.CHUNK_PROMPT_CHARS and " " in tail:
+        # Start on a word boundary
+        tail = tail.split(" ", 1)[1]
+    options["initial_prompt"] = tail
+
+def shift_segments(segments: List[Dict[str, Any]], offset: float):
+    """Move segment timestamps by offset seconds, in place"""
+    if not offset:
+        return
+    for segment in segments:
+        segment["start"] += offset
+        segment["end"] += offset
+
+def _attach_checkpoints(chunks: Iterable[Tuple[int, np.ndarray]],
+                        prefix: Optional[str]) -> Iterator[Tuple[int, np.ndarray, Optional[str], Optional[Dict[str, Any]]]]:
+    """Pair each chunk with its checkpoint key and any result saved by an earlier attempt"""
+    for chunk_start, chunk in chunks:
+        if prefix is None:
+            yield chunk_start, chunk, None, None
+            continue
+        key = checkpoint_key(prefix, chunk_start, chunk_start + len(chunk))
+        try:
+            saved = checkpoint_store.get(key)
+        except Exception as e:
+            logger.warning(f"⚠️ Checkpoint read failed: {e}")
+            saved = None
+        yield chunk_start, chunk, key, saved
+
+def _save_checkpoint(key: str, result: Dict[str, Any]):
+    try:
+        checkpoint_store.set(key, {
+            "text": result["text"],
+            "segments": result["segments"],
+            "language": result.get("language"),
+        })
+    except Exception as e:
+        logger.warning(f"⚠️ Checkpoint write failed: {e}")
+
+def _transcribe_chunks_sequential(model_size: Optional[str], chunks: Iterable[tuple],
+                                  options: Dict[str, Any]) -> Iterator[tuple]:
+    """Transcribe chunks one after another with the shared model"""
+    model = get_model(model_size)
+    for i, (chunk_start, chunk, key, saved) in enumerate(chunks):
+        if saved is not None:
+            yield chunk_start, key, saved, True
+            continue
+        logger.info(f"🔊 Processing chunk {i+1}...")
+
+        with get_inference_lock(model_size), metrics.timed(metrics.chunk_inference_seconds):
+            result = model.transcribe(chunk, **options)
+        del chunk
+        yield chunk_start, key, result, False
+
+def _transcribe_chunks_parallel(chunk_pool, chunks: Iterable[tuple], options: Dict[str, Any],
+                                model_size: Optional[str] = None) -> Iterator[tuple]:
+    """Dispatch chunks to the process pool, keeping a bounded number in flight, and yield results in order"""
+    max_in_flight = settings.CHUNK_WORKERS + 1
+    pending = deque()
+    for chunk_start, chunk, key, saved in chunks:
+        if saved is not None:
+            # Already done by an earlier attempt; queue it in order without touching the pool
+            future = Future()
+            future.set_result(saved)
+        else:
+            # Copy: the pool pickles arguments later, and options may change once a language is pinned
+            future = chunk_pool.submit(transcribe_chunk_in_worker, chunk, dict(options),
+                                       model_size or settings.MODEL_SIZE)
+        pending.append((chunk_start, key, future, saved is not None))
+        del chunk
+        if len(pending) >= max_in_flight:
+            yield _collect_worker_result(*pending.popleft())
+    while pending:
+        yield _collect_worker_result(*pending.popleft())
+
+def _collect_worker_result(chunk_start: int, key: Optional[str], future: Future, resumed: bool) -> tuple:
+    result = future.result()
+    if not resumed:
+        metrics.chunk_inference_seconds.observe(result.pop("inference_seconds"))
+    return chunk_start, key, result, resumed
+
+def transcribe_short_audio(audio: np.ndarray, language: Optional[str] = None, task: str = "transcribe",
+                           progress_callback: Optional[ProgressCallback] = None,
+                           model_size: Optional[str] = None) -> Dict[str, Any]:
     """Transcribe short audio files in one go"""
-    model = get_model()
+    model = get_model(model_size)
     options = {
         "fp16": False,
         "language": language,
         "task": task
     }
     options = {k: v for k, v in options.items() if v is not None}
-    
-    return model.transcribe(audio_path, **options)
\ No newline at end of file
+
+    with get_inference_lock(model_size):
+        result = model.transcribe(audio, **options)
+
+    if progress_callback:
+        progress_callback(1, 1)
+    return result
+
+def load_audio_input(input_path: str, start: float = 0.0,
+                     end: Optional[float] = None) -> Tuple[Optional[np.ndarray], float]:
+    """Decode an upload, or its start-end range, to 16 kHz PCM, or return (None, duration) when it is long enough to stream"""
+    # Very long inputs are streamed window by window so memory stays bounded
+    probed_duration = probe_duration(input_path)
+    if probed_duration is not None:
+        if start >= probed_duration:
+            raise ValueError(f"start {start:g}s is past the end of the audio ({probed_duration:.1f}s)")
+        range_duration = min(probed_duration, end if end is not None else probed_duration) - start
+        if range_duration > settings.STREAMING_DECODE_MIN_DURATION:
+            return None, range_duration
+
+    # Decode once; duration, chunking and inference all read this buffer
+    audio = decode_audio(input_path, start, end)
+    return audio, len(audio) / SAMPLE_RATE
+
+def transcribe_input(input_path: str, audio: Optional[np.ndarray], audio_duration: float,
+                     language: Optional[str] = None, task: str = "transcribe",
+                     progress_callback: Optional[ProgressCallback] = None,
+                     segment_callback: Optional[SegmentCallback] = None,
+                     keep_segments: bool = True, model_size: Optional[str] = None,
+                     checkpoint_prefix: Optional[str] = None, start: float = 0.0,
+                     end: Optional[float] = None) -> Tuple[Dict[str, Any], bool]:
+    """Pick the short, chunked or streaming path for loaded input; returns (result, chunked).
+
+    When `audio` holds only the start-end range of the file, timestamps are
+    shifted back onto the original file's timeline.
+    """
+    if audio is None:
+        result = transcribe_audio_stream(input_path, audio_duration, language, task, progress_callback,
+                                         segment_callback, keep_segments, model_size, checkpoint_prefix,
+                                         start, end)
+        return result, True
+
+    use_chunked_processing = audio_duration > 5 * 60  # 5 minutes
+    if use_chunked_processing:
+        result = transcribe_large_audio(audio, language, task, progress_callback, segment_callback,
+                                        keep_segments, model_size, checkpoint_prefix, start)
+    else:
+        result = transcribe_short_audio(audio, language, task, progress_callback, model_size)
+        shift_segments(result["segments"], start)
+        if segment_callback:
+            segment_callback(0, result["segments"], result["text"].strip())
+    return result, use_chunked_processing
+
+def build_response(result: Dict[str, Any], audio_duration: float, chunked: bool,
+                   filename: str, file_size: int, model_size: Optional[str] = None,
+                   processing_seconds: Optional[float] = None, range_start: Optional[float] = None) -> Dict[str, Any]:
+    """Shape a transcription result into the API response; range_start marks a start-end range transcription"""
+    quantized = registry.quantized(model_size)
+    real_time_factor = None
+    if processing_seconds is not None and audio_duration > 0:
+        # Wall time per second of audio; below 1.0 is faster than real time
+        real_time_factor = round(processing_seconds / audio_duration, 3)
+        logger.info(f"⏱️ RTF {real_time_factor} for {audio_duration:.1f}s of audio"
+                    f"{' (int8)' if quantized else ''}")
+    return {
+        "text": result["text"].strip(),
+        "language": result.get("language", "unknown"),
+        "duration_seconds": audio_duration,
+        "chunked_processing": chunked,
+        "segments": result.get("segments", []),
+        "metadata": {
+            "filename": filename,
+            "model_size": model_size or settings.MODEL_SIZE,
+            "device": registry.device_of(model_size),
+            "file_size_mb": round(file_size / 1024 / 1024, 2),
+            "quantized": quantized,
+            "processing_seconds": round(processing_seconds, 3) if processing_seconds is not None else None,
+            "real_time_factor": real_time_factor,
+            "resumed_chunks": result.get("resumed_chunks", 0),
+            "range": {
+                "start": range_start,
+                "end": round(range_start + audio_duration, 3),
+            } if range_start is not None else None,
+        }
+    }
@@ -8,10 +8,15 @@
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.middleware.rate_limiter import limiter
-from app.routes import health, transcription, info
+from app.middleware.rate_limiter import limiter, RateLimitExceeded
+from app.middleware.upload_limit import add_upload_limit_middleware
+from app.middleware.server_timing import add_server_timing_middleware
+from app.routes import health, transcription, info, live, metrics
 from app.core.config import settings
-from app.core.models import load_whisper_model
+from app.core.models import start_model_loading
+from app.core.jobs import job_manager
+from app.core.parallel import shutdown_chunk_pool
+from app.core.live import live_executor
 import logging
 import os
 
@@ -45,22 +50,32 @@ def create_application() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    add_upload_limit_middleware(app)
+    add_server_timing_middleware(app)
+    app.add_exception_handler(RateLimitExceeded, RateLimitExceeded._rate_limit_exceeded_handler)
 
     # Include routers
     app.include_router(health.router, prefix="/api/v1", tags=["Health"])
     app.include_router(info.router, prefix="/api/v1", tags=["Information"])
     app.include_router(transcription.router, prefix="/api/v1", tags=["Transcription"])
+    app.include_router(live.router, prefix="/api/v1", tags=["Live"])
+    app.include_router(metrics.router, prefix="/api/v1", tags=["Monitoring"])
     
     # Add startup and shutdown events
     @app.on_event("startup")
     async def startup_event():
         logger.info("🚀 Starting Transcription API...")
-        await load_whisper_model()
-        logger.info("✅ Transcription API is ready!")
+        # Bind right away; /api/v1/ready reports 503 until the model is loaded and warm
+        start_model_loading()
+        await job_manager.start()
+        logger.info("✅ Transcription API is accepting connections, model loading in background")
     
     @app.on_event("shutdown")
-    def shutdown_event():
+    async def shutdown_event():
         logger.info("🛑 Shutting down Transcription API")
+        await job_manager.stop()
+        shutdown_chunk_pool()
+        live_executor.shutdown(wait=False, cancel_futures=True)
     
     # Root endpoint
     @app.get("/")
@@ -1,17 +1,25 @@
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+from app.core.config import settings
+import app.utils.sqlite_limits  # noqa: F401  registers the sqlite:// storage scheme
+
+def create_limiter(key_func) -> Limiter:
+    """Limiter whose counters live in RATE_LIMIT_STORAGE_URI"""
+    return Limiter(key_func=key_func, storage_uri=settings.RATE_LIMIT_STORAGE_URI)
 
 # Rate limiting setup
-limiter = Limiter(key_func=get_remote_address)
+limiter = create_limiter(get_remote_address)
 
 def _rate_limit_exceeded_handler(request, exc):
     """Custom rate limit exceeded handler"""
     from fastapi.responses import JSONResponse
+    from app.utils.metrics import rate_limited
+    rate_limited.inc()
     return JSONResponse(
         status_code=429,
         content={"detail": f"Rate limit exceeded: {exc.detail}"}
     )
 
 # Attach the handler to the exception class
-RateLimitExceeded._rate_limit_exceeded_handler = _rate_limit_exceeded_handler
\ No newline at end of file
+RateLimitExceeded._rate_limit_exceeded_handler = _rate_limit_exceeded_handler
@@ -0,0 +1,36 @@
+import time
+from app.utils.metrics import http_request_seconds, start_request_timings
+
+class ServerTimingMiddleware:
+    """Add a Server-Timing header with the stages recorded while serving a request.
+
+    Stages are whatever the handler recorded through metrics.record_timing()
+    before the response started, plus "app" for the time until headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        timings = start_request_timings()
+
+        async def timing_send(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - started
+                http_request_seconds.observe(elapsed, method=scope["method"], status=message["status"])
+                entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+                entries.append(f"app;dur={elapsed * 1000:.1f}")
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", ", ".join(entries).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, timing_send)
+
+def add_server_timing_middleware(app):
+    """Add the Server-Timing middleware to the application"""
+    app.add_middleware(ServerTimingMiddleware)
@@ -0,0 +1,72 @@
+from fastapi.responses import JSONResponse
+from app.core.config import settings
+
+# Headroom for multipart boundaries and form fields around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+class _BodyTooLarge(Exception):
+    pass
+
+class UploadSizeLimitMiddleware:
+    """Reject request bodies over the upload limit before they are buffered.
+
+    Declared Content-Length is checked up front; chunked bodies are counted as
+    they arrive and cut off as soon as they cross the limit.
+    """
+
+    def __init__(self, app, max_body_size: int):
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT"):
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body_size:
+            return await self._reject(scope, receive, send)
+
+        received = 0
+        too_large = False
+        response_started = False
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    too_large = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started, rejected
+            if too_large and not response_started:
+                # The app may turn the cut-off into its own error (FastAPI answers a
+                # failed multipart parse with 400); send the 413 in its place
+                if not rejected:
+                    rejected = True
+                    await self._reject(scope, receive, send)
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except _BodyTooLarge:
+            if response_started:
+                raise
+        if too_large and not response_started and not rejected:
+            await self._reject(scope, receive, send)
+
+    async def _reject(self, scope, receive, send):
+        response = JSONResponse(status_code=413, content={"detail": "File too large"})
+        await response(scope, receive, send)
+
+def add_upload_limit_middleware(app):
+    """Add the upload size limit middleware to the application"""
+    app.add_middleware(UploadSizeLimitMiddleware, max_body_size=settings.MAX_FILE_SIZE + MULTIPART_OVERHEAD)
@@ -1,31 +1,43 @@
 from fastapi import APIRouter, Request
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from app.core.models import model
+from fastapi.responses import JSONResponse
+from app.core import models
+from app.middleware.rate_limiter import create_limiter
 from app.utils.cache import cleanup_old_cache, transcription_cache
 from datetime import datetime
 
 router = APIRouter()
-limiter = Limiter(key_func=lambda: "health")  # Simple limiter for health checks
+limiter = create_limiter(lambda: "health")  # Simple limiter for health checks
 
 @router.get("/health")
 @limiter.limit("30/minute")
 async def health(request: Request):
-    """Health check endpoint"""
+    """Liveness check: 200 while loading or serving, 503 once the model failed to load"""
     cache_size = len(transcription_cache)
     cleanup_old_cache()
-    
-    return {
-        "status": "healthy" if model is not None else "unhealthy",
-        "model_loaded": model is not None,
-        "device": "cuda" if model and hasattr(model, 'device') and 'cuda' in str(model.device) else "cpu",
+
+    failed = models.model_status == "failed"
+    return JSONResponse(status_code=503 if failed else 200, content={
+        "status": "unhealthy" if failed else "healthy",
+        "model_status": models.model_status,
+        "model_loaded": models.is_model_ready(),
+        "model_error": models.model_error,
+        "device": models.registry.device_of() if models.is_model_ready() else None,
         "cache_entries": cache_size,
         "timestamp": datetime.now().isoformat(),
         "service": "Transcription API"
-    }
+    })
 
 @router.get("/ready")
 async def readiness_probe():
     """Kubernetes-style readiness probe"""
-    if model is None:
-        return {"status": "not ready", "message": "Model not loaded"}, 503
-    return {"status": "ready", "message": "Service is ready to accept requests"}
\ No newline at end of file
+    if not models.is_model_ready():
+        return JSONResponse(status_code=503, content={
+            "status": "not ready",
+            "message": f"Model {models.model_status}",
+            "model_status": models.model_status,
+        })
+    return {
+        "status": "ready",
+        "message": "Service is ready to accept requests",
+        "model_load_seconds": models.model_load_seconds,
+    }
@@ -1,13 +1,14 @@
 from fastapi import APIRouter, Request
-import torch
 from app.core.config import settings
-from app.core.models import model
+from app.core import models
 
 router = APIRouter()
 
 @router.get("/info")
 async def get_info(request: Request):
     """Get detailed API information"""
+    import torch
+
     gpu_info = None
     if torch.cuda.is_available():
         gpu_info = {
@@ -18,10 +19,17 @@ async def get_info(request: Request):
     return {
         "service": settings.APP_TITLE,
         "version": settings.APP_VERSION,
-        "model_loaded": model is not None,
+        "model_loaded": models.is_model_ready(),
+        "model_status": models.model_status,
         "model_size": settings.MODEL_SIZE,
+        "available_model_sizes": settings.AVAILABLE_MODEL_SIZES,
+        "resident_models": models.registry.resident(),
+        "model_memory_mb": round(models.registry.resident_bytes / 1024 / 1024, 1),
+        "model_memory_budget_mb": settings.MODEL_MEMORY_BUDGET_MB,
         "device": "cuda" if torch.cuda.is_available() else "cpu",
         "gpu_info": gpu_info,
+        "cpu_quantize": settings.CPU_QUANTIZE,
+        "torch_threads": {"intra_op": torch.get_num_threads(), "inter_op": torch.get_num_interop_threads()},
         "supported_formats": settings.SUPPORTED_FORMATS,
         "max_file_size_mb": settings.MAX_FILE_SIZE / 1024 / 1024,
         "chunk_duration_minutes": settings.CHUNK_DURATION_MINUTES,
@@ -33,14 +41,23 @@ async def get_info(request: Request):
 @router.get("/stats")
 async def get_stats(request: Request):
     """Get API statistics"""
-    from app.utils.cache import transcription_cache
-    import json
+    from app.utils.cache import transcription_cache, disk_cache
+    from app.core.admission import admission_controller
+    import asyncio
     
-    cache_size_mb = sum(len(json.dumps(result).encode('utf-8')) for _, (_, result) in transcription_cache.items()) / 1024 / 1024
+    cache_stats = transcription_cache.stats()
+    disk_stats = await asyncio.to_thread(disk_cache.stats) if disk_cache else None
     
     return {
-        "cache_entries": len(transcription_cache),
-        "cache_size_mb": round(cache_size_mb, 2),
-        "device": "cuda" if torch.cuda.is_available() else "cpu",
+        "cache_entries": cache_stats["entries"],
+        "cache_size_mb": round(cache_stats["size_bytes"] / 1024 / 1024, 2),
+        "cache_max_mb": round(cache_stats["max_bytes"] / 1024 / 1024, 2),
+        "cache_hits": cache_stats["hits"],
+        "cache_misses": cache_stats["misses"],
+        "cache_evictions": cache_stats["evictions"],
+        "cache_expirations": cache_stats["expirations"],
+        "disk_cache": disk_stats,
+        "admission": admission_controller.stats(),
+        "device": models.registry.device_of() if models.is_model_ready() else None,
         "model_size": settings.MODEL_SIZE
     }
\ No newline at end of file
@@ -0,0 +1,78 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+import asyncio
+import json
+import logging
+from app.core.live import LiveSession, live_executor, live_sessions
+from app.core.models import is_model_ready
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+async def _decode_loop(websocket: WebSocket, session: LiveSession, audio_ready: asyncio.Event):
+    """Decode whenever enough audio has arrived, one decode in flight per session"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await audio_ready.wait()
+        audio_ready.clear()
+        if not session.ready():
+            continue
+        ended = session.ended
+        for message in await loop.run_in_executor(live_executor, session.decode):
+            await websocket.send_json(message)
+        if ended:
+            await websocket.send_json({"type": "done"})
+            return
+
+@router.websocket("/live")
+async def live_transcription(websocket: WebSocket, language: str = None, task: str = "transcribe"):
+    """Live transcription over WebSocket.
+
+    Send 16 kHz mono 16-bit little-endian PCM as binary frames and a text
+    frame {"type": "end"} to flush. The server pushes "partial" messages for
+    the unstable tail, "final" messages as segments settle, then "done". If
+    decoding falls behind, the oldest undecoded audio is dropped and a
+    "lagging" message says how many seconds were lost.
+    """
+    await websocket.accept()
+    if not is_model_ready():
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Model not loaded")
+        return
+    if live_sessions.locked():
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Too many live sessions")
+        return
+
+    async with live_sessions:
+        session = LiveSession(language, task)
+        audio_ready = asyncio.Event()
+        decoder = asyncio.create_task(_decode_loop(websocket, session, audio_ready))
+        logger.info("🎧 Live session started")
+        try:
+            while not decoder.done():
+                receive = asyncio.create_task(websocket.receive())
+                await asyncio.wait({receive, decoder}, return_when=asyncio.FIRST_COMPLETED)
+                if not receive.done():
+                    receive.cancel()
+                    break
+                message = receive.result()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    session.append(message["bytes"])
+                elif message.get("text"):
+                    try:
+                        end = json.loads(message["text"]).get("type") == "end"
+                    except (ValueError, AttributeError):
+                        end = False
+                    if end:
+                        session.ended = True
+                audio_ready.set()
+                if session.ended:
+                    await decoder
+                    break
+        except WebSocketDisconnect:
+            pass
+        finally:
+            if not decoder.done():
+                decoder.cancel()
+            await asyncio.gather(decoder, return_exceptions=True)
+            logger.info("🎧 Live session closed")
@@ -1,117 +1,306 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Request, BackgroundTasks
-from slowapi import Limiter, _rate_limit_exceeded_handler
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from slowapi.util import get_remote_address
 import os
+import json
+import time
+import asyncio
 import tempfile
-import aiofiles
-from datetime import datetime
+from typing import AsyncIterator, Tuple
 from app.core.config import settings
-from app.core.models import get_model, model
-from app.core.transcribe import transcribe_large_audio, transcribe_short_audio
-from app.utils.file_utils import convert_to_wav, get_file_hash
-from app.utils.cache import transcription_cache, cleanup_old_cache
+from app.middleware.rate_limiter import create_limiter
+from app.core.models import is_model_ready
+from app.core.admission import admission_controller, client_quota, AdmissionRejected
+from app.core.jobs import job_manager, TranscriptionJob, JobQueueFullError
+from app.utils.file_utils import spool_upload, probe_duration, FileTooLargeError
+from app.utils.cache import get_cached_result, make_cache_key
+from app.utils.fingerprint import fingerprint_index
+from app.utils import metrics
+from app.utils.response_format import (
+    SEGMENT_LAYOUTS, UnsupportedFormatError, parse_field_list, render_response, select_fields,
+)
 import logging
 
 router = APIRouter()
-limiter = Limiter(key_func=get_remote_address)
+limiter = create_limiter(get_remote_address)
 logger = logging.getLogger(__name__)
 
-@router.post("/transcribe")
-@limiter.limit(settings.RATE_LIMIT)
-async def transcribe_audio(
-    request: Request,
-    background_tasks: BackgroundTasks,
-    audio: UploadFile = File(..., description="Audio file to transcribe"),
-    language: str = None,
-    task: str = "transcribe",
-    use_cache: bool = True
-):
-    """Transcribe audio file to text - supports unlimited length"""
-    if model is None:
-        raise HTTPException(status_code=503, detail="Service unavailable: Model not loaded")
-    
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+def _check_range(start: float = None, end: float = None) -> float:
+    """Validate start/end query values; returns start with None meaning 0"""
+    start = start or 0.0
+    if start < 0:
+        raise HTTPException(status_code=400, detail="start must not be negative")
+    if end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    return start
+
+async def _admit(request: Request, path: str, file_size: int, start: float = 0.0,
+                 end: float = None) -> Tuple[float, int]:
+    """Charge the client's quota and reserve admission budget; returns (audio seconds reserved, quota charge)"""
+    duration = await asyncio.to_thread(probe_duration, path)
+    if duration is not None and start >= duration:
+        raise HTTPException(status_code=400, detail=f"start is past the end of the audio ({duration:.1f}s)")
+    total = duration if duration is not None else file_size / settings.ADMISSION_FALLBACK_BYTES_PER_SECOND
+    # A range is priced by its own length, not the file's
+    cost = max(0.0, (min(total, end) if end is not None else total) - start)
+    client = get_remote_address(request)
+    charge = await asyncio.to_thread(client_quota.charge, client, cost)
+    started = time.perf_counter()
+    try:
+        await admission_controller.acquire(cost)
+    except BaseException:
+        await asyncio.to_thread(client_quota.refund, client, charge)
+        raise
+    finally:
+        metrics.record_timing("admission", time.perf_counter() - started)
+    return cost, charge
+
+async def _create_job(request: Request, audio: UploadFile, language: str, task: str, use_cache: bool,
+                      stream: bool = False, model_size: str = None, start: float = None, end: float = None,
+                      pollable: bool = False):
+    """Validate and save an upload, returning either a cached response or a queued job"""
+    start = _check_range(start, end)
+    ranged = bool(start) or end is not None
+    model_size = model_size or settings.MODEL_SIZE
+    if model_size != settings.MODEL_SIZE and model_size not in settings.AVAILABLE_MODEL_SIZES:
+        raise HTTPException(status_code=400, detail=f"Unsupported model size, choose one of {settings.AVAILABLE_MODEL_SIZES}")
+
     # Validate file type
     if not audio.filename:
         raise HTTPException(status_code=400, detail="No filename provided")
-    
+
     file_ext = os.path.splitext(audio.filename.lower())[1]
     if file_ext not in settings.SUPPORTED_FORMATS:
         raise HTTPException(status_code=400, detail=f"Unsupported file format")
-    
-    # Read and validate file
-    content = await audio.read()
-    if len(content) > settings.MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="File too large")
-    
+
+    # Stream the upload to disk, hashing and size-checking each block;
+    # the job owns the file from here and deletes it when done
+    temp_input = tempfile.NamedTemporaryFile(delete=False, suffix=file_ext)
+    temp_input.close()
+    try:
+        with metrics.timed(metrics.upload_seconds, "upload"):
+            file_hash, file_size = await spool_upload(audio, temp_input.name)
+    except FileTooLargeError:
+        os.unlink(temp_input.name)
+        raise HTTPException(status_code=413, detail="File too large")
+    except Exception:
+        os.unlink(temp_input.name)
+        raise
+
     # Cache check
-    file_hash = get_file_hash(content)
-    if use_cache and file_hash in transcription_cache:
+    cache_key = make_cache_key(file_hash, model_size, language, task, start, end)
+    started = time.perf_counter()
+    cached_result = await get_cached_result(cache_key) if use_cache else None
+    metrics.record_timing("cache", time.perf_counter() - started)
+
+    if cached_result is not None:
         logger.info("♻️ Using cached transcription")
-        _, cached_result = transcription_cache[file_hash]
-        return cached_result
-    
-    temp_input = temp_wav = None
-    
+        os.unlink(temp_input.name)
+        return cached_result, None
+
+    # Admission is priced in audio seconds, so it can only happen once the file is on disk
     try:
-        # Save uploaded file
-        temp_input = tempfile.NamedTemporaryFile(delete=False, suffix=file_ext)
-        async with aiofiles.open(temp_input.name, 'wb') as f:
-            await f.write(content)
-        
-        # Convert to WAV if needed
-        if file_ext != '.wav':
-            temp_wav = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-            temp_wav.close()
-            if not convert_to_wav(temp_input.name, temp_wav.name):
-                raise HTTPException(status_code=400, detail="Failed to process audio file")
-            audio_path = temp_wav.name
-        else:
-            audio_path = temp_input.name
-        
-        # Get audio duration and decide processing method
-        from pydub import AudioSegment
-        audio_duration = len(AudioSegment.from_file(audio_path)) / 1000
-        use_chunked_processing = audio_duration > 5 * 60  # 5 minutes
-        
-        # Transcribe
-        logger.info(f"🎙️ Starting transcription for {audio.filename}")
-        
-        if use_chunked_processing:
-            result = transcribe_large_audio(audio_path, language, task)
+        admitted_seconds, quota_charge = await _admit(request, temp_input.name, file_size, start, end)
+    except AdmissionRejected as e:
+        os.unlink(temp_input.name)
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+    except BaseException:
+        os.unlink(temp_input.name)
+        raise
+
+    job = TranscriptionJob(
+        temp_input.name,
+        audio.filename,
+        file_size,
+        language=language,
+        task=task,
+        cache_key=cache_key if use_cache else None,
+        stream=stream,
+        model_size=model_size,
+        admitted_seconds=admitted_seconds,
+        content_hash=file_hash,
+        # A byte-level miss may still be a re-encode of cached audio; the job checks once it has
+        # decoded. Ranges skip this, since fingerprinting needs the whole file
+        fingerprint=use_cache and fingerprint_index is not None and not ranged,
+        start=start,
+        end=end,
+        pollable=pollable,
+    )
+    try:
+        job_manager.submit(job)
+    except JobQueueFullError as e:
+        os.unlink(temp_input.name)
+        admission_controller.release(admitted_seconds)
+        await asyncio.to_thread(client_quota.refund, get_remote_address(request), quota_charge)
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(admission_controller.retry_after())})
+    return None, job
+
+RESPONSE_FORMATS = ("json", "msgpack")
+
+def _check_output_options(layout: str, format: str = None):
+    """Reject bad shaping options before any upload work is done"""
+    if layout not in SEGMENT_LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"layout must be one of {SEGMENT_LAYOUTS}")
+    if format is not None and format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {RESPONSE_FORMATS}")
+
+async def _render(request: Request, payload: dict, fields: str, include: str, tokens: bool, layout: str,
+                  format: str = None, result_key: str = None):
+    """Apply field selection, then serialize and compress off the event loop"""
+    def shape_and_render():
+        if result_key is None:
+            shaped = select_fields(payload, parse_field_list(fields), parse_field_list(include), tokens, layout)
+        elif payload.get(result_key) is None:
+            shaped = payload
         else:
-            result = transcribe_short_audio(audio_path, language, task)
-        
-        logger.info("✅ Transcription completed")
-        
-        # Build response
-        response_data = {
-            "text": result["text"].strip(),
-            "language": result.get("language", "unknown"),
-            "duration_seconds": audio_duration,
-            "chunked_processing": use_chunked_processing,
-            "segments": result.get("segments", []),
-            "metadata": {
-                "filename": audio.filename,
-                "model_size": settings.MODEL_SIZE,
-                "device": "cuda" if get_model().device.type == "cuda" else "cpu",
-                "file_size_mb": round(len(content) / 1024 / 1024, 2),
-            }
-        }
-        
-        # Cache result
-        if use_cache:
-            transcription_cache[file_hash] = (datetime.now(), response_data)
-        
-        return response_data
-        
-    except Exception as e:
-        logger.error(f"❌ Transcription error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
-    finally:
-        # Cleanup
-        for temp_file in [temp_input, temp_wav]:
-            if temp_file and os.path.exists(temp_file.name):
-                try:
-                    os.unlink(temp_file.name)
-                except Exception as e:
-                    logger.warning(f"⚠️ Failed to delete temp file: {e}")
\ No newline at end of file
+            result = select_fields(payload[result_key], parse_field_list(fields), parse_field_list(include),
+                                   tokens, layout)
+            shaped = {**payload, result_key: result}
+        return render_response(shaped, request, format)
+
+    try:
+        return await asyncio.to_thread(shape_and_render)
+    except UnsupportedFormatError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+@router.post("/transcribe")
+@limiter.limit(settings.RATE_LIMIT)
+async def transcribe_audio(
+    request: Request,
+    audio: UploadFile = File(..., description="Audio file to transcribe"),
+    language: str = None,
+    task: str = "transcribe",
+    use_cache: bool = True,
+    model_size: str = None,
+    start: float = None,
+    end: float = None,
+    fields: str = None,
+    include: str = None,
+    tokens: bool = True,
+    layout: str = "rows",
+    format: str = None
+):
+    """Transcribe audio file to text - supports unlimited length.
+
+    start/end (seconds) transcribe only that range of the file; only the range
+    is decoded, and timestamps stay on the original file's timeline.
+
+    fields= keeps only the listed top-level keys, include= only the listed
+    segment keys, tokens=false drops token ids and layout=columns returns
+    segments as parallel arrays. Output is JSON, or MessagePack with
+    format=msgpack / Accept: application/msgpack, compressed with zstd or gzip
+    per Accept-Encoding.
+    """
+    _check_output_options(layout, format)
+    if not is_model_ready():
+        raise HTTPException(status_code=503, detail="Service unavailable: Model not loaded",
+                            headers={"Retry-After": "10"})
+
+    cached_result, job = await _create_job(request, audio, language, task, use_cache, model_size=model_size,
+                                           start=start, end=end)
+    if cached_result is None:
+        await job.wait()
+        # The caller gets the result in this response; it need not stay in the job table
+        job_manager.forget(job.id)
+        for stage, seconds in job.timings.items():
+            metrics.record_timing(stage, seconds)
+        if job.status == "failed":
+            raise HTTPException(status_code=500, detail=job.failure_detail())
+
+    started = time.perf_counter()
+    response = await _render(request, cached_result or job.result, fields, include, tokens, layout, format)
+    metrics.record_timing("render", time.perf_counter() - started)
+    return response
+
+def _format_event(event: dict, fmt: str) -> str:
+    if fmt == "sse":
+        return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    return json.dumps(event) + "\n"
+
+async def _replay_cached(result: dict) -> AsyncIterator[dict]:
+    yield {"type": "segments", "chunk": 0, "total_chunks": 1, "text": result["text"], "segments": result.get("segments", [])}
+    yield {"type": "summary", **{k: v for k, v in result.items() if k != "segments"}}
+
+@router.post("/transcribe/stream")
+@limiter.limit(settings.RATE_LIMIT)
+async def transcribe_audio_stream(
+    request: Request,
+    audio: UploadFile = File(..., description="Audio file to transcribe"),
+    language: str = None,
+    task: str = "transcribe",
+    use_cache: bool = True,
+    format: str = "ndjson",
+    model_size: str = None,
+    start: float = None,
+    end: float = None
+):
+    """Stream offset-corrected segments as each chunk finishes, then a summary record.
+
+    Emits NDJSON by default or Server-Sent Events with format=sse. Streamed
+    transcriptions are served from the cache but, since the server never holds
+    the full segment list, they do not populate it.
+    """
+    if format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+    if not is_model_ready():
+        raise HTTPException(status_code=503, detail="Service unavailable: Model not loaded",
+                            headers={"Retry-After": "10"})
+
+    cached_result, job = await _create_job(request, audio, language, task, use_cache, stream=True, model_size=model_size,
+                                           start=start, end=end)
+    events = _replay_cached(cached_result) if cached_result is not None else job.iter_events()
+
+    async def body():
+        try:
+            async for event in events:
+                yield _format_event(event, format)
+        finally:
+            # A client that disconnected mid-stream gets no more segments, so stop the job too
+            if job is not None:
+                job_manager.cancel(job.id)
+
+    return StreamingResponse(body(), media_type=STREAM_MEDIA_TYPES[format])
+
+@router.post("/jobs", status_code=202)
+@limiter.limit(settings.RATE_LIMIT)
+async def create_transcription_job(
+    request: Request,
+    audio: UploadFile = File(..., description="Audio file to transcribe"),
+    language: str = None,
+    task: str = "transcribe",
+    use_cache: bool = True,
+    model_size: str = None,
+    start: float = None,
+    end: float = None
+):
+    """Queue a transcription, optionally of a start-end range, and return its job id immediately"""
+    if not is_model_ready():
+        raise HTTPException(status_code=503, detail="Service unavailable: Model not loaded",
+                            headers={"Retry-After": "10"})
+
+    cached_result, job = await _create_job(request, audio, language, task, use_cache, model_size=model_size,
+                                           start=start, end=end, pollable=True)
+    if cached_result is not None:
+        return {"job_id": None, "status": "completed", "cached": True, "result": cached_result}
+
+    return {"job_id": job.id, "status": job.status, "cached": False}
+
+@router.get("/jobs/{job_id}")
+async def get_transcription_job(
+    request: Request,
+    job_id: str,
+    fields: str = None,
+    include: str = None,
+    tokens: bool = True,
+    layout: str = "rows",
+    format: str = None
+):
+    """Report status, chunk progress and, once finished, the result of a job (shaped as in /transcribe)"""
+    _check_output_options(layout, format)
+    status = await job_manager.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return await _render(request, status, fields, include, tokens, layout, format, result_key="result")
@@ -1,22 +1,165 @@
-from datetime import datetime, timedelta
+import asyncio
+import heapq
+import json
+import time
 import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from app.core.config import settings
+from app.utils.disk_cache import DiskCache
+from app.utils import metrics
 
 logger = logging.getLogger(__name__)
 
-# Global cache storage
-transcription_cache = {}
+class TranscriptionCache:
+    """In-memory LRU cache bounded by a byte budget, with per-entry TTL.
+
+    Entry sizes are measured once at insert time, expiry is driven by a heap
+    of deadlines, and all counters are maintained incrementally so reading
+    stats is O(1).
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: int):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # key -> (value, size_bytes, expires_at)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # (expires_at, key); stale pairs are skipped when popped
+        self._deadlines = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            self._expire_locked(time.monotonic())
+            return key in self._entries
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached value and mark it recently used, or None"""
+        with self._lock:
+            self._expire_locked(time.monotonic())
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """Insert or replace a value, evicting least recently used entries to fit the budget"""
+        size = len(json.dumps(value, default=str).encode('utf-8'))
+        if size > self.max_bytes:
+            logger.info(f"⚠️ Not caching {size / 1024 / 1024:.1f}MB result, larger than the cache budget")
+            return
+
+        now = time.monotonic()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._expire_locked(now)
+            self._remove_locked(key)
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove_locked(oldest)
+                self.evictions += 1
+            self._entries[key] = (value, size, expires_at)
+            self.current_bytes += size
+            heapq.heappush(self._deadlines, (expires_at, key))
+
+    def expire(self) -> int:
+        """Drop entries past their TTL and return how many were removed"""
+        with self._lock:
+            return self._expire_locked(time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _remove_locked(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[1]
+
+    def _expire_locked(self, now: float) -> int:
+        removed = 0
+        while self._deadlines and self._deadlines[0][0] <= now:
+            expires_at, key = heapq.heappop(self._deadlines)
+            entry = self._entries.get(key)
+            # Skip deadlines left behind by entries that were replaced or evicted
+            if entry is not None and entry[2] == expires_at:
+                self._remove_locked(key)
+                removed += 1
+        self.expirations += removed
+        # Keep the heap from accumulating stale deadlines under churn
+        if len(self._deadlines) > 2 * len(self._entries) + 64:
+            self._deadlines = [(entry[2], key) for key, entry in self._entries.items()]
+            heapq.heapify(self._deadlines)
+        return removed
+
+# Global cache storage: a per-process memory tier in front of a host-wide disk tier
+transcription_cache = TranscriptionCache(settings.CACHE_MAX_BYTES, settings.CACHE_TTL_SECONDS)
+disk_cache = DiskCache(settings.DISK_CACHE_PATH, settings.DISK_CACHE_MAX_BYTES) if settings.DISK_CACHE_ENABLED else None
+
+def range_suffix(start: float = 0.0, end: Optional[float] = None) -> str:
+    """Key suffix for a start-end range; empty for the whole file so existing keys stay valid"""
+    if not start and end is None:
+        return ""
+    return f":{start:g}-{'' if end is None else format(end, 'g')}"
+
+def model_variant(model_size: str) -> str:
+    """Model size plus ':int8' under CPU_QUANTIZE, whose outputs differ from full precision"""
+    return f"{model_size}:int8" if settings.CPU_QUANTIZE else model_size
+
+def make_cache_key(content_hash: str, model_size: str, language: Optional[str], task: str,
+                   start: float = 0.0, end: Optional[float] = None) -> str:
+    """Cache key covering everything that changes the transcription output"""
+    return f"{content_hash}:{model_variant(model_size)}:{language or 'auto'}:{task}{range_suffix(start, end)}"
+
+async def get_cached_result(key: str) -> Optional[Dict[str, Any]]:
+    """Look a result up in memory, then on disk, promoting disk hits into memory"""
+    result = transcription_cache.get(key)
+    metrics.cache_requests.inc(tier="memory", result="miss" if result is None else "hit")
+    if result is not None or disk_cache is None:
+        return result
+    try:
+        result = await asyncio.to_thread(disk_cache.get, key)
+    except Exception as e:
+        logger.warning(f"⚠️ Disk cache read failed: {e}")
+        metrics.errors.inc(stage="disk_cache")
+        return None
+    metrics.cache_requests.inc(tier="disk", result="miss" if result is None else "hit")
+    if result is not None:
+        await asyncio.to_thread(transcription_cache.set, key, result)
+    return result
+
+async def store_cached_result(key: str, result: Dict[str, Any]):
+    """Write a result through to both cache tiers"""
+    # Sizing and serializing the entry is CPU work; keep it off the loop
+    await asyncio.to_thread(transcription_cache.set, key, result)
+    if disk_cache is not None:
+        try:
+            await asyncio.to_thread(disk_cache.set, key, result)
+        except Exception as e:
+            logger.warning(f"⚠️ Disk cache write failed: {e}")
+            metrics.errors.inc(stage="disk_cache")
 
 def cleanup_old_cache():
-    """Remove cache entries older than 1 hour"""
-    current_time = datetime.now()
-    keys_to_remove = []
-    
-    for key, (timestamp, _) in transcription_cache.items():
-        if current_time - timestamp > timedelta(hours=1):
-            keys_to_remove.append(key)
-    
-    for key in keys_to_remove:
-        del transcription_cache[key]
-    
-    if keys_to_remove:
-        logger.info(f"🧹 Cleaned up {len(keys_to_remove)} old cache entries")
\ No newline at end of file
+    """Remove cache entries past their TTL"""
+    removed = transcription_cache.expire()
+    if removed:
+        logger.info(f"🧹 Cleaned up {removed} old cache entries")
@@ -0,0 +1,64 @@
+import json
+import time
+import zlib
+import sqlite3
+import logging
+from typing import Dict, Any, Optional
+from app.core.config import settings
+from app.utils.cache import model_variant, range_suffix
+from app.utils.sqlite_db import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_created ON chunks (created_at);
+"""
+
+class ChunkCheckpointStore:
+    """Per-chunk transcription results in SQLite, so a failed or retried job only redoes missing chunks.
+
+    Rows are keyed by content hash, decode options and the chunk's sample
+    range, and are dropped after ttl seconds.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.db = SQLiteDatabase(path, _SCHEMA, sweep=self._sweep)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self.db.connect().execute(
+            "SELECT value FROM chunks WHERE key = ? AND created_at > ?", (key, time.time() - self.ttl_seconds)
+        ).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def set(self, key: str, value: Dict[str, Any]):
+        blob = zlib.compress(json.dumps(value, default=str).encode('utf-8'), 3)
+        conn = self.db.connect()
+        conn.execute("INSERT OR REPLACE INTO chunks (key, value, created_at) VALUES (?, ?, ?)", (key, blob, time.time()))
+        self.db.wrote(conn)
+
+    def _sweep(self, conn: sqlite3.Connection):
+        removed = conn.execute("DELETE FROM chunks WHERE created_at <= ?", (time.time() - self.ttl_seconds,)).rowcount
+        if removed:
+            logger.info(f"🧹 Dropped {removed} expired chunk checkpoints")
+
+def make_checkpoint_prefix(content_hash: str, model_size: Optional[str], language: Optional[str], task: str,
+                           start: float = 0.0, end: Optional[float] = None) -> str:
+    """Key prefix covering the input and every option that changes a chunk's output"""
+    # Chunk sample ranges are relative to the decoded range, so the range is part of the prefix
+    return (f"{content_hash}:{model_variant(model_size or settings.MODEL_SIZE)}:{language or 'auto'}:{task}"
+            f"{range_suffix(start, end)}")
+
+def checkpoint_key(prefix: str, start: int, end: int) -> str:
+    return f"{prefix}:{start}-{end}"
+
+checkpoint_store = (
+    ChunkCheckpointStore(settings.CHECKPOINT_PATH, settings.CHECKPOINT_TTL_HOURS * 3600)
+    if settings.CHECKPOINTS_ENABLED else None
+)
@@ -0,0 +1,97 @@
+import json
+import time
+import zlib
+import sqlite3
+import logging
+from typing import Dict, Any, Optional
+from app.utils.sqlite_db import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcriptions (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transcriptions_accessed ON transcriptions (accessed_at);
+-- Running totals, so pruning and stats never scan the table
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    entries INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS transcriptions_insert AFTER INSERT ON transcriptions BEGIN
+    UPDATE totals SET entries = entries + 1, size = size + NEW.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS transcriptions_update AFTER UPDATE OF size ON transcriptions BEGIN
+    UPDATE totals SET size = size + NEW.size - OLD.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS transcriptions_delete AFTER DELETE ON transcriptions BEGIN
+    UPDATE totals SET entries = entries - 1, size = size - OLD.size WHERE id = 1;
+END;
+-- Seeds the totals of a cache written before they existed; a no-op afterwards
+INSERT OR IGNORE INTO totals (id, entries, size)
+    SELECT 1, COUNT(*), COALESCE(SUM(size), 0) FROM transcriptions;
+COMMIT;
+"""
+
+class DiskCache:
+    """SQLite-backed transcription cache shared by every worker on the host.
+
+    Values are stored as zlib-compressed JSON. WAL mode lets concurrent
+    uvicorn workers read while one writes; the least recently used rows are
+    dropped once the database grows past max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.db = SQLiteDatabase(path, _SCHEMA)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        conn = self.db.connect()
+        row = conn.execute("SELECT value FROM transcriptions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE transcriptions SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, key: str, value: Dict[str, Any]):
+        blob = zlib.compress(json.dumps(value, default=str).encode('utf-8'), 3)
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        conn = self.db.connect()
+        # An upsert rather than INSERT OR REPLACE: REPLACE's implicit delete skips the totals trigger
+        conn.execute(
+            "INSERT INTO transcriptions (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+            "created_at = excluded.created_at, accessed_at = excluded.accessed_at",
+            (key, blob, len(blob), now, now),
+        )
+        self._prune(conn)
+
+    def _prune(self, conn: sqlite3.Connection):
+        """Drop least recently used rows until the stored bytes fit the budget"""
+        total = conn.execute("SELECT size FROM totals").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM transcriptions ORDER BY accessed_at"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM transcriptions WHERE key = ?", victims)
+        logger.info(f"🧹 Evicted {len(victims)} entries from the disk cache")
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self.db.connect()
+        entries, size = conn.execute("SELECT entries, size FROM totals").fetchone()
+        return {"entries": entries, "size_bytes": size, "max_bytes": self.max_bytes, "path": self.path}
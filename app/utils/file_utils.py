@@ -1,23 +1,168 @@
 import os
+import asyncio
 import hashlib
 import logging
+import subprocess
+import aiofiles
+import numpy as np
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
 from pydub import AudioSegment
 from app.core.config import settings
+from app.utils import metrics
 
 logger = logging.getLogger(__name__)
 
+# Whisper's native input rate
+SAMPLE_RATE = 16000
+
+class FileTooLargeError(ValueError):
+    """Raised when an upload exceeds MAX_FILE_SIZE"""
+
 def get_file_hash(file_content: bytes) -> str:
     """Generate a hash for caching"""
-    return hashlib.md5(file_content).hexdigest()
+    return hashlib.blake2b(file_content, digest_size=32).hexdigest()
+
+async def spool_upload(upload, dest_path: str, max_size: int = settings.MAX_FILE_SIZE) -> Tuple[str, int]:
+    """Copy an upload to a named file block by block, hashing as it goes.
+
+    Returns (content hash, size). Starlette has already spooled the multipart
+    body (in memory up to 1 MB, then to an unnamed temp file) before the
+    handler runs, so this is a second copy; it exists because ffmpeg needs a
+    path and queued jobs outlive the request, whose file Starlette closes.
+    Oversized bodies are refused earlier, while they arrive, by
+    UploadSizeLimitMiddleware; the FileTooLargeError raised here once the
+    copy crosses max_size is a backstop for apps without it.
+    """
+    hasher = hashlib.blake2b(digest_size=32)
+    size = 0
+    async with aiofiles.open(dest_path, 'wb') as f:
+        while True:
+            block = await upload.read(settings.UPLOAD_BLOCK_SIZE)
+            if not block:
+                break
+            size += len(block)
+            if size > max_size:
+                raise FileTooLargeError("File too large")
+            # hashlib releases the GIL on large buffers, so hashing overlaps the write
+            await asyncio.gather(asyncio.to_thread(hasher.update, block), f.write(block))
+    return hasher.hexdigest(), size
 
 def convert_to_wav(in_path: str, out_path: str) -> bool:
     """Convert any audio file to WAV format"""
     try:
-        audio = AudioSegment.from_file(in_path)
-        audio = audio.set_frame_rate(16000).set_channels(1)
-        audio.export(out_path, format="wav")
+        with metrics.timed(metrics.convert_seconds, "convert"):
+            audio = AudioSegment.from_file(in_path)
+            audio = audio.set_frame_rate(16000).set_channels(1)
+            audio.export(out_path, format="wav")
         logger.info(f"✅ Successfully converted {in_path} to WAV")
         return True
     except Exception as e:
         logger.error(f"❌ Audio conversion failed: {e}")
-        return False
\ No newline at end of file
+        metrics.errors.inc(stage="convert")
+        return False
+
+def _ffmpeg_pcm_command(in_path: str, start: float = 0.0, end: Optional[float] = None) -> list:
+    """ffmpeg invocation that writes 16 kHz mono s16le PCM to stdout.
+
+    start/end (seconds) are input options, so ffmpeg seeks in the container
+    rather than decoding and discarding everything before the range.
+    """
+    window = []
+    if start:
+        window += ["-ss", f"{start:.3f}"]
+    if end is not None:
+        window += ["-t", f"{end - start:.3f}"]
+    return [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        *window,
+        "-i", in_path,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE),
+        "-",
+    ]
+
+def _pcm_to_float(raw: bytes) -> np.ndarray:
+    return np.frombuffer(raw, np.int16).astype(np.float32) / 32768.0
+
+def probe_duration(in_path: str) -> Optional[float]:
+    """Read the container duration in seconds without decoding, or None if unknown"""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        in_path,
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout.decode().strip()
+        return float(out)
+    except (subprocess.CalledProcessError, ValueError):
+        logger.warning(f"⚠️ Could not probe duration of {in_path}")
+        return None
+
+def decode_audio(in_path: str, start: float = 0.0, end: Optional[float] = None) -> np.ndarray:
+    """Decode any audio file, or the start-end range of it, to a float32 16 kHz mono array through an ffmpeg pipe"""
+    cmd = _ffmpeg_pcm_command(in_path, start, end)
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        logger.error(f"❌ Audio decoding failed: {e.stderr.decode(errors='ignore')[-500:]}")
+        raise ValueError("Failed to process audio file") from e
+    
+    return _pcm_to_float(out)
+
+@contextmanager
+def _pcm_stream(in_path: str, start: float = 0.0, end: Optional[float] = None):
+    """Run ffmpeg decoding to a PCM pipe and make sure it is reaped"""
+    proc = subprocess.Popen(_ffmpeg_pcm_command(in_path, start, end), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        yield proc
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+
+def _read_samples(proc, count: int) -> np.ndarray:
+    raw = proc.stdout.read(count * 2)
+    return _pcm_to_float(raw[:len(raw) - len(raw) % 2])
+
+def iter_audio_windows(in_path: str, window: int, step: int, start: float = 0.0,
+                       end: Optional[float] = None) -> Iterator[Tuple[int, np.ndarray]]:
+    """Stream 16 kHz mono windows of `window` samples starting every `step` samples.
+
+    Only the current window and the overlap carried into the next one are held
+    in memory, whatever the length of the input. Sample positions are relative
+    to `start`.
+    """
+    with _pcm_stream(in_path, start, end) as proc:
+        start = 0
+        carry = np.empty(0, dtype=np.float32)
+        while True:
+            need = window - len(carry)
+            fresh = _read_samples(proc, need)
+            if len(fresh) == 0:
+                break
+            chunk = np.concatenate([carry, fresh]) if len(carry) else fresh
+            yield start, chunk
+            if len(fresh) < need:
+                break
+            carry = chunk[step:].copy()
+            start += step
+            del chunk, fresh
+        if proc.wait() != 0 and start == 0 and len(carry) == 0:
+            raise ValueError("Failed to process audio file")
+
+def iter_pcm_blocks(in_path: str, block: int, start: float = 0.0, end: Optional[float] = None) -> Iterator[np.ndarray]:
+    """Stream 16 kHz mono PCM, optionally of the start-end range only, in consecutive blocks of `block` samples"""
+    with _pcm_stream(in_path, start, end) as proc:
+        produced = False
+        while True:
+            samples = _read_samples(proc, block)
+            if len(samples) == 0:
+                break
+            produced = True
+            yield samples
+            if len(samples) < block:
+                break
+        if proc.wait() != 0 and not produced:
+            raise ValueError("Failed to process audio file")
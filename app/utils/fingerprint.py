@@ -0,0 +1,173 @@
+import time
+import sqlite3
+import hashlib
+import logging
+import numpy as np
+from typing import List, NamedTuple, Optional
+from app.core.config import settings
+from app.utils.file_utils import SAMPLE_RATE, iter_pcm_blocks
+from app.utils.sqlite_db import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+# Part of every fingerprint id; bump when the algorithm changes so old ids stop matching
+FINGERPRINT_VERSION = 1
+FRAME_SAMPLES = 8192  # ~0.5s at 16 kHz
+# Log-spaced band edges in Hz; stays below the low-pass of low-bitrate encoders
+BAND_EDGES_HZ = (300, 450, 675, 1000, 1500, 2250, 3400, 5100)
+# Leading audio quieter than this is encoder padding or silence, not content
+ONSET_LEVEL = 0.01
+SILENCE_RMS = 10 ** (-50 / 20)
+# Fewer frames than this are too easy to collide; fall back to the byte hash
+MIN_FRAMES = 16
+DECODE_BLOCK_SAMPLES = SAMPLE_RATE * 30
+# Re-encodes differ in a few percent of bits, unrelated audio in about half
+MATCH_BIT_ERROR_RATE = 0.15
+# Trailing padding and decoder rounding can change the length by a frame or two
+MAX_FRAME_DRIFT = 2
+MAX_CANDIDATES = 64
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    id TEXT PRIMARY KEY,
+    frames INTEGER NOT NULL,
+    bits BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fingerprints_frames ON fingerprints (frames);
+"""
+
+_WINDOW = np.hanning(FRAME_SAMPLES).astype(np.float32)
+_BAND_BINS = np.round(np.array(BAND_EDGES_HZ) * FRAME_SAMPLES / SAMPLE_RATE).astype(int)
+
+class Fingerprint(NamedTuple):
+    frames: int
+    bits: bytes
+
+class AudioFingerprinter:
+    """Incremental fingerprint of decoded 16 kHz PCM that survives re-encoding.
+
+    Each ~0.5s frame contributes one bit per adjacent band pair: whether the
+    log-energy difference between the bands rose or fell since the previous
+    frame. Container, tags and codec change the bytes but rarely these signs.
+    Leading and trailing silence are dropped so encoder padding and delay do
+    not shift the frame grid.
+    """
+
+    def __init__(self):
+        self._pending = np.empty(0, dtype=np.float32)
+        self._started = False
+        self._previous: Optional[np.ndarray] = None
+        self._bits: List[np.ndarray] = []
+        self._silent: List[bool] = []
+
+    def update(self, samples: np.ndarray):
+        if not self._started:
+            loud = np.flatnonzero(np.abs(samples) > ONSET_LEVEL)
+            if len(loud) == 0:
+                return
+            samples = samples[loud[0]:]
+            self._started = True
+
+        pending = np.concatenate([self._pending, samples]) if len(self._pending) else samples
+        count = len(pending) // FRAME_SAMPLES
+        if count:
+            self._add_frames(pending[:count * FRAME_SAMPLES].reshape(count, FRAME_SAMPLES))
+        self._pending = pending[count * FRAME_SAMPLES:].copy()
+
+    def _add_frames(self, frames: np.ndarray):
+        spectrum = np.abs(np.fft.rfft(frames * _WINDOW, axis=1)) ** 2
+        bands = np.add.reduceat(spectrum[:, _BAND_BINS[0]:_BAND_BINS[-1]], _BAND_BINS[:-1] - _BAND_BINS[0], axis=1)
+        contrast = np.diff(np.log(bands + 1e-10), axis=1)
+        previous = contrast[0] if self._previous is None else self._previous
+        deltas = np.diff(np.vstack([previous, contrast]), axis=0)
+        self._previous = contrast[-1]
+        self._bits.extend(deltas > 0)
+        self._silent.extend(np.sqrt(np.mean(frames ** 2, axis=1)) < SILENCE_RMS)
+
+    def finish(self) -> Optional[Fingerprint]:
+        """Fingerprint of everything fed so far, or None if there is too little audio to trust it"""
+        end = len(self._silent)
+        while end and self._silent[end - 1]:
+            end -= 1
+        if end < MIN_FRAMES:
+            return None
+        return Fingerprint(end, np.packbits(np.asarray(self._bits[:end])).tobytes())
+
+def fingerprint_file(in_path: str) -> Optional[Fingerprint]:
+    """Decode a file block by block and fingerprint it, or None if unusable"""
+    fingerprinter = AudioFingerprinter()
+    try:
+        for block in iter_pcm_blocks(in_path, DECODE_BLOCK_SAMPLES):
+            fingerprinter.update(block)
+    except ValueError as e:
+        logger.warning(f"⚠️ Could not fingerprint {in_path}: {e}")
+        return None
+    return fingerprinter.finish()
+
+def fingerprint_samples(audio: np.ndarray) -> Optional[Fingerprint]:
+    """Fingerprint audio that is already decoded, a block at a time to bound the FFT buffers"""
+    fingerprinter = AudioFingerprinter()
+    for offset in range(0, len(audio), DECODE_BLOCK_SAMPLES):
+        fingerprinter.update(audio[offset:offset + DECODE_BLOCK_SAMPLES])
+    return fingerprinter.finish()
+
+def bit_error_rate(a: Fingerprint, b: Fingerprint) -> float:
+    """Share of differing bits over the frames both fingerprints cover"""
+    length = min(len(a.bits), len(b.bits))
+    differing = np.unpackbits(np.frombuffer(a.bits[:length], np.uint8) ^ np.frombuffer(b.bits[:length], np.uint8))
+    return float(differing.sum()) / (length * 8)
+
+class FingerprintIndex:
+    """Maps a fingerprint to the id of the first stored fingerprint it matches.
+
+    Re-encodes flip a few percent of the bits, so ids are resolved by bit error
+    rate against stored fingerprints of nearly the same length rather than by
+    exact hash. Unrelated audio agrees on about half its bits.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.db = SQLiteDatabase(path, _SCHEMA, sweep=self._sweep)
+
+    def resolve(self, fingerprint: Fingerprint) -> str:
+        """Id of the closest stored match, or a new id registered for this fingerprint"""
+        conn = self.db.connect()
+        now = time.time()
+        rows = conn.execute(
+            "SELECT id, frames, bits FROM fingerprints WHERE frames BETWEEN ? AND ? AND created_at > ? "
+            "ORDER BY created_at DESC LIMIT ?",
+            (fingerprint.frames - MAX_FRAME_DRIFT, fingerprint.frames + MAX_FRAME_DRIFT,
+             now - self.ttl_seconds, MAX_CANDIDATES),
+        ).fetchall()
+        best = min(((bit_error_rate(fingerprint, Fingerprint(frames, bits)), fp_id) for fp_id, frames, bits in rows),
+                   default=None)
+        if best is not None and best[0] <= MATCH_BIT_ERROR_RATE:
+            # Keep fingerprints that are still being matched from expiring
+            conn.execute("UPDATE fingerprints SET created_at = ? WHERE id = ?", (now, best[1]))
+            return best[1]
+
+        fp_id = f"fp{FINGERPRINT_VERSION}-" + hashlib.blake2b(fingerprint.bits, digest_size=16).hexdigest()
+        conn.execute("INSERT OR REPLACE INTO fingerprints (id, frames, bits, created_at) VALUES (?, ?, ?, ?)",
+                     (fp_id, fingerprint.frames, fingerprint.bits, now))
+        self.db.wrote(conn)
+        return fp_id
+
+    def _sweep(self, conn: sqlite3.Connection):
+        conn.execute("DELETE FROM fingerprints WHERE created_at <= ?", (time.time() - self.ttl_seconds,))
+
+fingerprint_index = (
+    FingerprintIndex(settings.AUDIO_FINGERPRINT_PATH, settings.AUDIO_FINGERPRINT_TTL_HOURS * 3600)
+    if settings.AUDIO_FINGERPRINT_ENABLED else None
+)
+
+def audio_fingerprint_id(in_path: str, audio: Optional[np.ndarray] = None) -> Optional[str]:
+    """Cache id shared by every encoding of the same audio, or None to fall back to the byte hash.
+
+    Pass the decoded 16 kHz audio when there is one; otherwise the file is decoded here.
+    """
+    if fingerprint_index is None:
+        return None
+    fingerprint = fingerprint_samples(audio) if audio is not None else fingerprint_file(in_path)
+    return fingerprint_index.resolve(fingerprint) if fingerprint is not None else None
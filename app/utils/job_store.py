@@ -0,0 +1,73 @@
+import json
+import time
+import zlib
+import sqlite3
+import logging
+from typing import Dict, Any, Optional
+from app.core.config import settings
+from app.utils.sqlite_db import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    value BLOB NOT NULL,
+    finished INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs (updated_at);
+"""
+
+class JobStore:
+    """Status snapshots of queued jobs in SQLite, so any pre-forked worker can answer GET /jobs/{id}.
+
+    Snapshots are written from the event loop's executor and from inference
+    threads, so they can land out of order; each carries a per-job version and
+    an older one never overwrites a newer one. Rows not updated for ttl
+    seconds, or finished beyond max_finished, are dropped.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int, max_finished: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_finished = max_finished
+        self.db = SQLiteDatabase(path, _SCHEMA, sweep=self._sweep)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self.db.connect().execute(
+            "SELECT value FROM jobs WHERE id = ? AND updated_at > ?", (job_id, time.time() - self.ttl_seconds)
+        ).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def set(self, job_id: str, version: int, value: Dict[str, Any], finished: bool):
+        """Store a snapshot unless a newer version is already there; failures are logged, not raised"""
+        blob = zlib.compress(json.dumps(value, default=str).encode('utf-8'), 3)
+        try:
+            conn = self.db.connect()
+            conn.execute(
+                "INSERT INTO jobs (id, version, value, finished, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET version = excluded.version, value = excluded.value, "
+                "finished = excluded.finished, updated_at = excluded.updated_at "
+                "WHERE excluded.version > jobs.version",
+                (job_id, version, blob, int(finished), time.time()),
+            )
+            self.db.wrote(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Could not store status of job {job_id}: {e}")
+
+    def _sweep(self, conn: sqlite3.Connection):
+        removed = conn.execute("DELETE FROM jobs WHERE updated_at <= ?", (time.time() - self.ttl_seconds,)).rowcount
+        removed += conn.execute(
+            "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE finished ORDER BY updated_at DESC "
+            "LIMIT -1 OFFSET ?)", (self.max_finished,)
+        ).rowcount
+        if removed:
+            logger.info(f"🧹 Dropped {removed} stored job statuses")
+
+# Only pre-forked workers need it; a single process answers from its own JobManager
+job_store = (
+    JobStore(settings.JOB_STORE_PATH, settings.JOB_RESULT_TTL, settings.JOB_MAX_RETAINED * settings.PREFORK_WORKERS)
+    if settings.PREFORK_WORKERS > 0 else None
+)
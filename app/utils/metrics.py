@@ -0,0 +1,183 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Stage durations for the request being served, read by the Server-Timing middleware
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+# Seconds; spans a cache hit through a multi-hour chunked job
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+AUDIO_BUCKETS = (1, 5, 10, 30, 60, 300, 600, 1800, 3600, 7200, 14400)
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class Gauge(_Metric):
+    """Gauge whose labelled values are read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._collect: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+
+    def set_function(self, collect: Callable[[], Dict[Tuple[str, ...], float]]):
+        """Register a callback returning {label values tuple: value}"""
+        self._collect = collect
+
+    def _samples(self) -> List[str]:
+        values = self._collect() if self._collect else {}
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in values.items()]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (last slot is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+upload_seconds = registry.register(Histogram(
+    "bloomnote_upload_seconds", "Time spent spooling an upload to disk while hashing it"))
+decode_seconds = registry.register(Histogram(
+    "bloomnote_decode_seconds", "Time spent probing and decoding an upload to PCM"))
+fingerprint_seconds = registry.register(Histogram(
+    "bloomnote_fingerprint_seconds", "Time spent fingerprinting decoded audio for the cache"))
+convert_seconds = registry.register(Histogram(
+    "bloomnote_convert_seconds", "Time spent in convert_to_wav"))
+inference_seconds = registry.register(Histogram(
+    "bloomnote_inference_seconds", "Time spent transcribing one job", ("path",)))
+chunk_inference_seconds = registry.register(Histogram(
+    "bloomnote_chunk_inference_seconds", "Time spent transcribing one chunk of a long file"))
+audio_seconds = registry.register(Histogram(
+    "bloomnote_audio_seconds", "Duration of audio processed per job", buckets=AUDIO_BUCKETS))
+http_request_seconds = registry.register(Histogram(
+    "bloomnote_http_request_seconds", "Time until response headers are sent", ("method", "status")))
+cache_requests = registry.register(Counter(
+    "bloomnote_cache_requests_total", "Transcription cache lookups", ("tier", "result")))
+errors = registry.register(Counter(
+    "bloomnote_errors_total", "Failures by pipeline stage", ("stage",)))
+rate_limited = registry.register(Counter(
+    "bloomnote_rate_limited_total", "Requests rejected by the rate limiter"))
+admission_rejections = registry.register(Counter(
+    "bloomnote_admission_rejections_total", "Requests refused by admission control", ("reason",)))
+admission_audio_seconds = registry.register(Gauge(
+    "bloomnote_admission_audio_seconds", "Audio seconds admitted or waiting for admission", ("state",)))
+jobs_in_flight = registry.register(Gauge(
+    "bloomnote_jobs", "Transcription jobs by state", ("state",)))
+model_memory_bytes = registry.register(Gauge(
+    "bloomnote_model_memory_bytes", "Memory held by resident Whisper models", ("model_size",)))
+
+def record_timing(name: str, seconds: float):
+    """Add a stage duration to the current request's Server-Timing header, if any"""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+@contextmanager
+def timed(histogram: Histogram, timing_name: Optional[str] = None, **labels) -> Iterator[None]:
+    """Observe a block's duration in a histogram and optionally in Server-Timing"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        histogram.observe(elapsed, **labels)
+        if timing_name:
+            record_timing(timing_name, elapsed)
+
+def start_request_timings() -> Dict[str, float]:
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
@@ -0,0 +1,104 @@
+import gzip
+import json
+import logging
+from typing import Dict, Any, Optional, Set, Tuple
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_LAYOUTS = ("rows", "columns")
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 5
+ZSTD_LEVEL = 3
+
+class UnsupportedFormatError(ValueError):
+    """Raised when a requested output format's optional dependency is not installed"""
+
+def parse_field_list(value: Optional[str]) -> Optional[Set[str]]:
+    """Comma-separated query value to a set, or None when absent"""
+    if not value:
+        return None
+    return {item.strip() for item in value.split(",") if item.strip()}
+
+def select_fields(result: Dict[str, Any], fields: Optional[Set[str]] = None, include: Optional[Set[str]] = None,
+                  tokens: bool = True, layout: str = "rows") -> Dict[str, Any]:
+    """Trim a transcription response to the requested top-level fields and segment keys.
+
+    `fields` picks top-level keys, `include` picks segment keys, tokens=False
+    drops token id lists, and layout="columns" turns the segment list into
+    parallel arrays keyed by segment field.
+    """
+    if layout not in SEGMENT_LAYOUTS:
+        raise ValueError(f"layout must be one of {SEGMENT_LAYOUTS}")
+
+    shaped = result if fields is None else {k: v for k, v in result.items() if k in fields}
+    segments = shaped.get("segments")
+    if segments is None or (include is None and tokens and layout == "rows"):
+        return shaped
+
+    keys = list(include) if include is not None else list(segments[0].keys()) if segments else []
+    if not tokens:
+        keys = [key for key in keys if key != "tokens"]
+
+    if layout == "columns":
+        shaped_segments = {key: [segment.get(key) for segment in segments] for key in keys}
+    else:
+        shaped_segments = [{key: segment[key] for key in keys if key in segment} for segment in segments]
+    return {**shaped, "segments": shaped_segments}
+
+def _accepts(header: str, token: str) -> bool:
+    """Whether an Accept/Accept-Encoding header lists `token` with a non-zero quality"""
+    for part in header.split(","):
+        name, *params = part.split(";")
+        if name.strip().lower() != token:
+            continue
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+def _serialize(payload: Dict[str, Any], request: Request, fmt: Optional[str]) -> Tuple[bytes, str]:
+    want_msgpack = fmt == "msgpack" or (fmt is None and _accepts(request.headers.get("accept", ""), MSGPACK_MEDIA_TYPE))
+    if want_msgpack:
+        if msgpack is None:
+            raise UnsupportedFormatError("MessagePack output needs the optional 'msgpack' package")
+        return msgpack.packb(payload, use_bin_type=True, default=str), MSGPACK_MEDIA_TYPE
+    body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+    return body, "application/json"
+
+def _compress(body: bytes, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    if zstandard is not None and _accepts(accept_encoding, "zstd"):
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body), "zstd"
+    if _accepts(accept_encoding, "gzip"):
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+def render_response(payload: Dict[str, Any], request: Request, fmt: Optional[str] = None,
+                    status_code: int = 200) -> Response:
+    """Serialize to JSON or MessagePack and compress per Accept / Accept-Encoding; CPU-bound for big payloads"""
+    body, media_type = _serialize(payload, request, fmt)
+    body, encoding = _compress(body, request.headers.get("accept-encoding", ""))
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, media_type=media_type, headers=headers)
@@ -0,0 +1,41 @@
+import os
+import sqlite3
+import threading
+from typing import Callable, Optional
+
+class SQLiteDatabase:
+    """A WAL-mode SQLite file shared by every worker on the host.
+
+    sqlite3 connections must not be shared across threads or forked
+    processes, so one is opened per thread and per pid. An optional sweep
+    callback (e.g. dropping expired rows) runs once every sweep_every writes
+    reported through wrote().
+    """
+
+    def __init__(self, path: str, schema: str, timeout: float = 30.0,
+                 sweep: Optional[Callable[[sqlite3.Connection], None]] = None, sweep_every: int = 100):
+        self.path = path
+        self.schema = schema
+        self.timeout = timeout
+        self.sweep = sweep
+        self.sweep_every = sweep_every
+        self._local = threading.local()
+        self._writes = 0
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.schema)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def wrote(self, conn: sqlite3.Connection):
+        """Count a write, running the sweep when it is due"""
+        self._writes += 1
+        if self.sweep is not None and self._writes % self.sweep_every == 0:
+            self.sweep(conn)
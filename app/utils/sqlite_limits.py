@@ -0,0 +1,98 @@
+import os
+import time
+import sqlite3
+import logging
+from limits.storage import Storage
+from app.utils.sqlite_db import SQLiteDatabase
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_counters_expires ON counters (expires_at);
+"""
+
+logger = logging.getLogger(__name__)
+
+# Counters are read and bumped on the event loop, so never block it for long
+# on a lock held by another worker; a contended hit is let through instead
+BUSY_TIMEOUT = 1.0
+# Sweep expired counters for all keys once every this many increments
+SWEEP_EVERY = 1000
+
+class SQLiteStorage(Storage):
+    """Fixed-window rate-limit counters in a SQLite file, shared by every worker on the host.
+
+    Registered as sqlite:///path/to/file for `limits` / slowapi. Each increment
+    runs in its own immediate transaction, so concurrent processes never lose
+    a hit. Calls are synchronous on the event loop, so when the file stays
+    locked past BUSY_TIMEOUT they fail open: the hit is not counted.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        self.path = os.path.expanduser(uri[len("sqlite://"):])
+        self.db = SQLiteDatabase(self.path, _SCHEMA, timeout=BUSY_TIMEOUT, sweep=self._sweep, sweep_every=SWEEP_EVERY)
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        now = time.time()
+        try:
+            conn = self.db.connect()
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            logger.warning(f"⚠️ Rate-limit store busy, not counting {key}: {e}")
+            return 0
+        try:
+            conn.execute("DELETE FROM counters WHERE key = ? AND expires_at <= ?", (key, now))
+            conn.execute(
+                "INSERT INTO counters (key, count, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET count = count + excluded.count",
+                (key, amount, now + expiry),
+            )
+            count = conn.execute("SELECT count FROM counters WHERE key = ?", (key,)).fetchone()[0]
+            self.db.wrote(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return count
+
+    def get(self, key: str) -> int:
+        row = self._read("SELECT count FROM counters WHERE key = ? AND expires_at > ?", key)
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        row = self._read("SELECT expires_at FROM counters WHERE key = ? AND expires_at > ?", key)
+        return row[0] if row else time.time()
+
+    def _read(self, query: str, key: str):
+        """One row for an unexpired key, or None (also when the store is busy)"""
+        try:
+            return self.db.connect().execute(query, (key, time.time())).fetchone()
+        except sqlite3.OperationalError as e:
+            logger.warning(f"⚠️ Rate-limit store busy, treating {key} as unused: {e}")
+            return None
+
+    def check(self) -> bool:
+        try:
+            self.db.connect().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        return self.db.connect().execute("DELETE FROM counters").rowcount
+
+    def clear(self, key: str) -> None:
+        self.db.connect().execute("DELETE FROM counters WHERE key = ?", (key,))
+
+    def _sweep(self, conn: sqlite3.Connection):
+        conn.execute("DELETE FROM counters WHERE expires_at <= ?", (time.time(),))
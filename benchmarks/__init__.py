@@ -0,0 +1 @@
+"""Offline benchmarks for the transcription pipeline; run with `python -m benchmarks --help`"""
@@ -0,0 +1,99 @@
+"""Benchmark the transcription pipeline stage by stage and under concurrent in-process load"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+# Keep pipeline logs out of the report; must run before app.main configures logging
+logging.basicConfig(level=logging.WARNING)
+
+from app.core import models
+from app.core.config import settings
+from benchmarks.audio import CODECS, write_audio
+from benchmarks.load import run_load
+from benchmarks.stages import run_stages
+from benchmarks.stub import StubModel
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def _csv(value: str) -> list:
+    return [item for item in value.split(",") if item]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument("--codecs", type=_csv, default=["wav", "mp3"], help=f"comma list of {','.join(CODECS)}")
+    parser.add_argument("--durations", type=_csv, default=["30", "600", "3600"],
+                        help="comma list of seconds, capped at MAX_TOTAL_DURATION")
+    parser.add_argument("--real-model", action="store_true", help="load MODEL_SIZE instead of the stub")
+    parser.add_argument("--stub-rtf", type=float, default=0.05, help="stub seconds of compute per audio second")
+    parser.add_argument("--load-requests", type=int, default=32)
+    parser.add_argument("--load-concurrency", type=int, default=8)
+    parser.add_argument("--load-duration", type=float, default=20.0, help="seconds of audio per load request")
+    parser.add_argument("--load-codec", default="mp3", choices=sorted(CODECS))
+    parser.add_argument("--skip-stages", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", "-o", help="write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+def install_model(args):
+    if args.real_model:
+        asyncio.run(models.load_whisper_model())
+        return
+    # The batcher calls whisper.decode directly and chunk workers load real weights
+    settings.BATCH_ENABLED = False
+    settings.CHUNK_WORKERS = 0
+    models.set_default_model(StubModel(args.stub_rtf))
+
+def main(argv=None):
+    args = parse_args(argv)
+    install_model(args)
+
+    report = {
+        "revision": _git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "model": settings.MODEL_SIZE if args.real_model else f"stub(rtf={args.stub_rtf})",
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "stages": [],
+        "load": None,
+    }
+
+    with tempfile.TemporaryDirectory(prefix="bloomnote-bench-") as tmp:
+        if not args.skip_stages:
+            for seconds in sorted({min(float(d), settings.MAX_TOTAL_DURATION) for d in args.durations}):
+                for codec in args.codecs:
+                    path = os.path.join(tmp, f"synthetic-{seconds:.0f}s.{codec}")
+                    write_audio(path, seconds, codec, args.seed)
+                    print(f"⏱️ stages: {codec} {seconds:.0f}s", file=sys.stderr)
+                    report["stages"].append({"codec": codec, **run_stages(path)})
+                    os.unlink(path)
+
+        if not args.skip_load:
+            path = os.path.join(tmp, f"load.{args.load_codec}")
+            write_audio(path, args.load_duration, args.load_codec, args.seed)
+            print(f"⏱️ load: {args.load_requests} requests x {args.load_concurrency} concurrent", file=sys.stderr)
+            report["load"] = asyncio.run(
+                run_load(path, args.load_duration, args.load_requests, args.load_concurrency)
+            )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
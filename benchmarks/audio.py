@@ -0,0 +1,65 @@
+import subprocess
+import numpy as np
+from typing import Iterator
+from app.utils.file_utils import SAMPLE_RATE
+
+# ffmpeg encoder arguments per output container
+CODECS = {
+    "wav": ["-c:a", "pcm_s16le"],
+    "flac": ["-c:a", "flac"],
+    "mp3": ["-c:a", "libmp3lame", "-b:a", "64k"],
+    "m4a": ["-c:a", "aac", "-b:a", "64k"],
+    "ogg": ["-c:a", "libvorbis", "-q:a", "3"],
+}
+
+# One 20-second cycle: voiced tone, short pause, noise, longer pause
+PATTERN = [("tone", 8.0), ("silence", 0.8), ("tone", 6.0), ("noise", 3.0), ("silence", 2.2)]
+# Every LONG_SILENCE_EVERY seconds insert a pause long enough to be skipped entirely
+LONG_SILENCE_EVERY = 300
+LONG_SILENCE_SECONDS = 15.0
+
+def _segment(kind: str, seconds: float, rng: np.random.Generator) -> np.ndarray:
+    n = int(seconds * SAMPLE_RATE)
+    t = np.arange(n, dtype=np.float32) / SAMPLE_RATE
+    if kind == "silence":
+        return (rng.standard_normal(n) * 1e-4).astype(np.float32)
+    if kind == "noise":
+        return (rng.standard_normal(n) * 0.03).astype(np.float32)
+    # Speech-like tone: a wandering fundamental with harmonics and ~4 Hz syllable envelope
+    f0 = rng.uniform(110, 220) * (1 + 0.05 * np.sin(2 * np.pi * 0.3 * t))
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    voice = sum(np.sin(k * phase) / k for k in range(1, 5))
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * rng.uniform(3, 5) * t)) ** 2
+    return (0.1 * voice * envelope).astype(np.float32)
+
+def iter_signal(duration: float, seed: int = 0) -> Iterator[np.ndarray]:
+    """Yield float32 16 kHz blocks of deterministic synthetic audio totalling `duration` seconds"""
+    rng = np.random.default_rng(seed)
+    produced = 0.0
+    next_long_silence = LONG_SILENCE_EVERY
+    while produced < duration:
+        for kind, seconds in PATTERN:
+            if produced >= next_long_silence:
+                kind, seconds = "silence", LONG_SILENCE_SECONDS
+                next_long_silence += LONG_SILENCE_EVERY
+            seconds = min(seconds, duration - produced)
+            if seconds <= 0:
+                return
+            yield _segment(kind, seconds, rng)
+            produced += seconds
+
+def write_audio(path: str, duration: float, codec: str, seed: int = 0):
+    """Encode synthetic audio to `path`, streaming blocks into ffmpeg so memory stays flat"""
+    cmd = [
+        "ffmpeg", "-nostdin", "-y", "-loglevel", "error",
+        "-f", "f32le", "-ar", str(SAMPLE_RATE), "-ac", "1", "-i", "-",
+        *CODECS[codec], path,
+    ]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    try:
+        for block in iter_signal(duration, seed):
+            proc.stdin.write(block.tobytes())
+    finally:
+        proc.stdin.close()
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to encode {codec}")
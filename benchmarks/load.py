@@ -0,0 +1,50 @@
+import asyncio
+import os
+import time
+from collections import Counter
+from typing import Dict, Any
+import httpx
+from benchmarks.measure import peak_rss_mb, percentiles
+
+async def run_load(path: str, audio_seconds: float, requests: int, concurrency: int) -> Dict[str, Any]:
+    """POST the same file `requests` times to /api/v1/transcribe through the in-process app"""
+    from app.main import app
+    from app.routes.transcription import limiter
+
+    # The per-client rate limit would reject almost everything from one in-process client
+    limiter.enabled = False
+    with open(path, "rb") as f:
+        body = f.read()
+    filename = os.path.basename(path)
+
+    latencies = []
+    statuses = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            async def one():
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.post(
+                        "/api/v1/transcribe", params={"use_cache": "false"}, files={"audio": (filename, body)}
+                    )
+                    latencies.append(time.perf_counter() - started)
+                    statuses[response.status_code] += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(requests)))
+            elapsed = time.perf_counter() - started
+
+    ok = statuses.get(200, 0)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+        "wall_seconds": round(elapsed, 3),
+        "latency_seconds": percentiles(latencies),
+        "throughput_rps": round(ok / elapsed, 3),
+        "audio_seconds_per_second": round(ok * audio_seconds / elapsed, 3),
+        "peak_rss_mb": peak_rss_mb(),
+    }
@@ -0,0 +1,28 @@
+import math
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+@contextmanager
+def timed(timings: Dict[str, float], name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round(time.perf_counter() - started, 4)
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 by nearest rank"""
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None}
+    ordered = sorted(samples)
+    pick = lambda q: round(ordered[max(0, math.ceil(q * len(ordered)) - 1)], 4)
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
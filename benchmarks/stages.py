@@ -0,0 +1,68 @@
+import os
+import tempfile
+from typing import Dict, Any
+from app.core.config import settings
+from app.core.chunking import plan_chunks, iter_speech_chunks
+from app.core.transcribe import transcribe_input, build_response, _chunk_geometry
+from app.utils.file_utils import convert_to_wav, decode_audio, iter_pcm_blocks, probe_duration, SAMPLE_RATE
+from benchmarks.measure import peak_rss_mb, timed
+
+def run_stages(path: str) -> Dict[str, Any]:
+    """Time decode, convert_to_wav, chunking, inference and response building on one file"""
+    timings: Dict[str, float] = {}
+    rss: Dict[str, float] = {}
+    chunk_length, _ = _chunk_geometry()
+    search = settings.CHUNK_SEARCH_SECONDS * SAMPLE_RATE
+
+    duration = probe_duration(path)
+    # Mirror load_audio_input: past the threshold the service never holds the whole buffer
+    streaming = duration is not None and duration > settings.STREAMING_DECODE_MIN_DURATION
+
+    with timed(timings, "decode"):
+        if streaming:
+            audio = None
+            for _ in iter_pcm_blocks(path, search):
+                pass
+        else:
+            audio = decode_audio(path)
+            duration = len(audio) / SAMPLE_RATE
+    rss["decode"] = peak_rss_mb()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with timed(timings, "convert_to_wav"):
+            converted = convert_to_wav(path, os.path.join(tmp, "converted.wav"))
+    if not converted:
+        # convert_to_wav reports failure instead of raising; a failed stage must not pass as a timing
+        raise RuntimeError(f"convert_to_wav failed on {path}")
+    rss["convert_to_wav"] = peak_rss_mb()
+
+    with timed(timings, "chunking"):
+        if streaming:
+            # Planning is interleaved with decoding here, so this includes a second decode pass
+            chunks = sum(1 for _ in iter_speech_chunks(iter_pcm_blocks(path, search), chunk_length, search))
+        else:
+            chunks = len(plan_chunks(audio, chunk_length, search))
+    rss["chunking"] = peak_rss_mb()
+
+    with timed(timings, "inference"):
+        result, chunked = transcribe_input(path, audio, duration)
+    rss["inference"] = peak_rss_mb()
+
+    with timed(timings, "response"):
+        build_response(result, duration, chunked, os.path.basename(path), os.path.getsize(path))
+    rss["response"] = peak_rss_mb()
+
+    total = sum(timings.values())
+    return {
+        "duration_seconds": round(duration, 2),
+        "file_size_mb": round(os.path.getsize(path) / 1024 / 1024, 2),
+        "streaming_decode": streaming,
+        "chunked": chunked,
+        "chunks": chunks,
+        "segments": len(result["segments"]),
+        "stage_seconds": timings,
+        "peak_rss_mb_after_stage": rss,
+        "total_seconds": round(total, 4),
+        "real_time_factor": round(total / duration, 5),
+        "inference_real_time_factor": round(timings["inference"] / duration, 5),
+    }
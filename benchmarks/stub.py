@@ -0,0 +1,45 @@
+import time
+import numpy as np
+from types import SimpleNamespace
+from typing import Dict, Any
+from app.utils.file_utils import SAMPLE_RATE
+
+# Seconds of audio per fake segment
+SEGMENT_SECONDS = 5.0
+
+class StubModel:
+    """Stands in for a Whisper model so the pipeline runs without torch or weights.
+
+    transcribe() sleeps for `rtf` seconds per second of audio (releasing the GIL
+    the way real inference does) and returns one fixed-text segment per
+    SEGMENT_SECONDS of input.
+    """
+
+    device = SimpleNamespace(type="cpu")
+
+    def __init__(self, rtf: float = 0.05):
+        self.rtf = rtf
+
+    def parameters(self):
+        return []
+
+    def buffers(self):
+        return []
+
+    def modules(self):
+        return []
+
+    def transcribe(self, audio: np.ndarray, **options) -> Dict[str, Any]:
+        duration = len(audio) / SAMPLE_RATE
+        time.sleep(duration * self.rtf)
+        starts = np.arange(0, duration, SEGMENT_SECONDS)
+        segments = [
+            {"id": i, "start": float(start), "end": float(min(start + SEGMENT_SECONDS, duration)),
+             "text": " benchmark", "tokens": [50364, 18069]}
+            for i, start in enumerate(starts)
+        ]
+        return {
+            "text": "".join(s["text"] for s in segments),
+            "segments": segments,
+            "language": options.get("language", "en"),
+        }
@@ -1,9 +1,19 @@
 import uvicorn
 import sys
+import os
+import gc
+import time
+import signal
+import socket
+import asyncio
 import shutil
+import traceback
 from app.main import app
 from app.core.config import settings
 
+# A worker that dies sooner than this after starting is respawned with a delay
+MIN_WORKER_UPTIME = 5
+
 def check_dependencies():
     """Check if all required dependencies are available"""
     missing_deps = []
@@ -39,9 +49,98 @@ def check_dependencies():
     print("✅ All dependencies are available")
     return True
 
+def _run_worker(sock: socket.socket, workers: int):
+    """Serve the already-loaded app on the inherited socket (runs in a forked child)"""
+    import torch
+    from app.core.admission import admission_controller
+
+    # Split the host between workers instead of each assuming it owns every core
+    if settings.TORCH_INTRA_OP_THREADS <= 0:
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    admission_controller.budget_seconds /= workers
+
+    config = uvicorn.Config(app, log_level=settings.LOG_LEVEL)
+    uvicorn.Server(config).run(sockets=[sock])
+
+def _spawn_worker(sock: socket.socket, workers: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            _run_worker(sock, workers)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            # Never fall back into the master's loop from a child
+            os._exit(code)
+    return pid
+
+def serve_prefork(workers: int):
+    """Load the model once, then fork workers that share its weights copy-on-write.
+
+    Children only read the weight tensors, so their pages stay shared with the
+    master. gc.freeze() keeps the collector from writing to every pre-fork
+    object header, and workers that exit are respawned without reloading.
+    Rate limits, quotas and POST /jobs statuses live in SQLite files under
+    ~/.cache/bloomnote, so a job can be polled through any worker.
+    """
+    from app.core import models
+
+    # Warm-up would start torch's OpenMP pool in the master, which forked children cannot reuse
+    settings.MODEL_WARMUP = False
+    asyncio.run(models.load_whisper_model())
+
+    sock = socket.create_server((settings.HOST, settings.PORT), backlog=2048)
+    sock.set_inheritable(True)
+
+    gc.collect()
+    gc.freeze()
+
+    children = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(workers):
+        children[_spawn_worker(sock, workers)] = time.monotonic()
+    print(f"👥 Master {os.getpid()} serving with {workers} pre-forked workers")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        print(f"⚠️ Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, respawning")
+        if time.monotonic() - started < MIN_WORKER_UPTIME:
+            time.sleep(MIN_WORKER_UPTIME)
+        children[_spawn_worker(sock, workers)] = time.monotonic()
+
+    sock.close()
+
 if __name__ == "__main__":
     if check_dependencies():
         print(f"🚀 Starting Transcription API on {settings.HOST}:{settings.PORT}")
+        if settings.PREFORK_WORKERS > 0:
+            serve_prefork(settings.PREFORK_WORKERS)
+            sys.exit(0)
         uvicorn.run(
             "app.main:app",
             host=settings.HOST,
@@ -0,0 +1,137 @@
+import asyncio
+import sqlite3
+import pytest
+from app.core.admission import AdmissionController, AdmissionRejected, ClientQuota
+
+def make_controller(budget=100.0, max_waiting=4, max_wait=0.2, workers=1) -> AdmissionController:
+    return AdmissionController(budget, max_waiting, max_wait, workers)
+
+def test_admits_within_budget_and_releases():
+    async def scenario():
+        controller = make_controller()
+        await controller.acquire(60)
+        await controller.acquire(40)
+        assert controller.in_flight_seconds == 100
+        controller.release(60)
+        assert controller.in_flight_seconds == 40
+    asyncio.run(scenario())
+
+def test_oversized_request_admitted_when_idle():
+    async def scenario():
+        controller = make_controller(budget=10)
+        await controller.acquire(500)
+        assert controller.in_flight_seconds == 500
+    asyncio.run(scenario())
+
+def test_waiter_admitted_in_order_on_release():
+    async def scenario():
+        controller = make_controller(max_wait=5)
+        await controller.acquire(80)
+        first = asyncio.create_task(controller.acquire(50))
+        second = asyncio.create_task(controller.acquire(10))
+        await asyncio.sleep(0)
+        # FIFO: the small request must not jump ahead of the first waiter
+        assert not first.done() and not second.done()
+        controller.release(80)
+        await asyncio.gather(first, second)
+        assert controller.in_flight_seconds == 60
+    asyncio.run(scenario())
+
+def test_queue_full_rejects_with_retry_after():
+    async def scenario():
+        controller = make_controller(max_waiting=1, max_wait=5)
+        await controller.acquire(100)
+        waiter = asyncio.create_task(controller.acquire(10))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.acquire(10)
+        assert excinfo.value.status_code == 503
+        assert excinfo.value.retry_after >= 1
+        assert controller.rejections == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+    asyncio.run(scenario())
+
+def test_head_timeout_wakes_waiters_that_fit():
+    async def scenario():
+        controller = make_controller(max_wait=5)
+        await controller.acquire(70)
+        controller.max_wait = 0.05
+        head = asyncio.create_task(controller.acquire(50))
+        await asyncio.sleep(0)
+        controller.max_wait = 5
+        behind = asyncio.create_task(controller.acquire(20))
+        with pytest.raises(AdmissionRejected):
+            await head
+        # The head gave up; the 20 s request fits in the remaining 30 s and must not starve
+        await asyncio.wait_for(behind, 1)
+        assert controller.in_flight_seconds == 90
+    asyncio.run(scenario())
+
+def test_cancelled_head_wakes_waiters_that_fit():
+    async def scenario():
+        controller = make_controller(max_wait=5)
+        await controller.acquire(70)
+        head = asyncio.create_task(controller.acquire(50))
+        await asyncio.sleep(0)
+        behind = asyncio.create_task(controller.acquire(20))
+        await asyncio.sleep(0)
+        head.cancel()
+        await asyncio.gather(head, return_exceptions=True)
+        await asyncio.wait_for(behind, 1)
+        assert controller.in_flight_seconds == 90
+        assert controller.stats()["waiting"] == 0
+    asyncio.run(scenario())
+
+def test_cancel_after_admission_returns_budget():
+    async def scenario():
+        controller = make_controller(max_wait=5)
+        await controller.acquire(100)
+        waiter = asyncio.create_task(controller.acquire(30))
+        await asyncio.sleep(0)
+        controller.release(100)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert controller.in_flight_seconds in (0, 30)
+    asyncio.run(scenario())
+
+def test_observe_smooths_real_time_factor():
+    controller = make_controller()
+    controller.rtf = 0.5
+    controller.observe(processing_seconds=100, audio_seconds=100)
+    assert 0.5 < controller.rtf < 1.0
+    controller.observe(processing_seconds=10, audio_seconds=0)
+    assert 0.5 < controller.rtf < 1.0
+
+def test_client_quota_charges_refunds_and_rejects():
+    quota = ClientQuota(limit_seconds=100, window=3600, storage_uri="memory://")
+    assert quota.charge("a", 60.2) == 61
+    with pytest.raises(AdmissionRejected) as excinfo:
+        quota.charge("a", 50)
+    assert excinfo.value.status_code == 429
+    # A rejected charge is not counted, and another client has its own window
+    assert quota.charge("a", 39) == 39
+    assert quota.charge("b", 90) == 90
+    quota.refund("a", 39)
+    assert quota.charge("a", 39) == 39
+
+def test_disabled_quota_never_charges():
+    quota = ClientQuota(limit_seconds=0, window=3600, storage_uri="memory://")
+    assert not quota.enabled
+    assert quota.charge("a", 10_000) == 0
+
+def test_quota_charge_not_recorded_by_a_busy_store_is_not_refunded(tmp_path, monkeypatch):
+    from app.utils import sqlite_limits
+    monkeypatch.setattr(sqlite_limits, "BUSY_TIMEOUT", 0.05)
+    path = tmp_path / "limits.db"
+    quota = ClientQuota(limit_seconds=100, window=3600, storage_uri=f"sqlite://{path}")
+    assert quota.charge("a", 10) == 10
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN EXCLUSIVE")
+    try:
+        # Fails open: admitted, but nothing was counted, so there is nothing to give back
+        assert quota.charge("a", 30) == 0
+    finally:
+        other.execute("ROLLBACK")
+    quota.refund("a", 0)
+    assert quota._storage.get(quota._key("a")) == 10
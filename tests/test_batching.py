@@ -0,0 +1,32 @@
+from app.core.batching import split_timestamped_tokens
+
+TIMESTAMP_BEGIN = 1000
+
+def decode(tokens):
+    return "".join(f" w{token}" for token in tokens)
+
+def ts(seconds: float) -> int:
+    return TIMESTAMP_BEGIN + round(seconds / 0.02)
+
+def spans(tokens, clip_seconds=5.0):
+    segments = split_timestamped_tokens(tokens, TIMESTAMP_BEGIN, decode, clip_seconds)
+    return [(segment["start"], segment["end"], segment["text"]) for segment in segments]
+
+def test_splits_at_consecutive_timestamps():
+    tokens = [ts(0), 1, 2, ts(1), ts(1), 3, ts(2.4)]
+    assert spans(tokens) == [(0.0, 1.0, " w1 w2"), (1.0, 2.4, " w3")]
+
+def test_unterminated_tail_runs_to_clip_end():
+    tokens = [ts(0), 1, 2, ts(1), ts(1), 3]
+    assert spans(tokens) == [(0.0, 1.0, " w1 w2"), (1.0, 5.0, " w3")]
+
+def test_single_segment_ends_at_last_timestamp():
+    assert spans([ts(0.5), 1, 2, ts(3)]) == [(0.0, 3.0, " w1 w2")]
+
+def test_no_timestamps_spans_clip():
+    assert spans([1, 2], clip_seconds=4.2) == [(0.0, 4.2, " w1 w2")]
+
+def test_empty_pieces_dropped_and_ids_sequential():
+    segments = split_timestamped_tokens([ts(0), 1, ts(1), ts(1), ts(2)], TIMESTAMP_BEGIN, decode, 5.0)
+    assert [segment["id"] for segment in segments] == [0]
+    assert segments[0]["tokens"] == [ts(0), 1, ts(1)]
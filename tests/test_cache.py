@@ -0,0 +1,85 @@
+import json
+import pytest
+from app.utils import cache as cache_module
+from app.utils.cache import TranscriptionCache, make_cache_key, range_suffix
+
+def entry(text: str) -> dict:
+    return {"text": text}
+
+def size_of(value: dict) -> int:
+    return len(json.dumps(value).encode('utf-8'))
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+def test_evicts_least_recently_used_to_fit_byte_budget():
+    cache = TranscriptionCache(size_of(entry("aaaa")) * 2, 3600)
+    cache.set("a", entry("aaaa"))
+    cache.set("b", entry("bbbb"))
+    assert cache.get("a") == entry("aaaa")  # now b is least recently used
+    cache.set("c", entry("cccc"))
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+    assert cache.current_bytes == size_of(entry("aaaa")) * 2
+    assert cache.evictions == 1
+
+def test_replacing_a_key_updates_accounting():
+    cache = TranscriptionCache(1024, 3600)
+    cache.set("a", entry("short"))
+    cache.set("a", entry("a longer value"))
+    assert len(cache) == 1
+    assert cache.current_bytes == size_of(entry("a longer value"))
+
+def test_oversized_value_is_not_cached():
+    cache = TranscriptionCache(10, 3600)
+    cache.set("a", entry("far too large for the budget"))
+    assert len(cache) == 0 and cache.current_bytes == 0
+
+def test_entries_expire_after_ttl(clock):
+    cache = TranscriptionCache(1024, 60)
+    cache.set("a", entry("a"))
+    clock[0] += 30
+    cache.set("b", entry("b"))
+    clock[0] += 31
+    assert cache.get("a") is None
+    assert cache.get("b") == entry("b")
+    clock[0] += 30
+    assert cache.expire() == 1
+    assert len(cache) == 0 and cache.current_bytes == 0
+    assert cache.expirations == 2
+
+def test_replaced_entry_keeps_its_new_deadline(clock):
+    cache = TranscriptionCache(1024, 60)
+    cache.set("a", entry("old"))
+    clock[0] += 50
+    cache.set("a", entry("new"))
+    clock[0] += 20
+    # The first deadline has passed, but it belonged to the replaced value
+    assert cache.get("a") == entry("new")
+
+def test_stats_count_hits_and_misses():
+    cache = TranscriptionCache(1024, 3600)
+    cache.set("a", entry("a"))
+    cache.get("a")
+    cache.get("missing")
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["size_bytes"] == size_of(entry("a"))
+
+def test_cache_key_covers_options_and_range():
+    key = make_cache_key("hash", "base", None, "transcribe")
+    assert key == "hash:base:auto:transcribe"
+    assert make_cache_key("hash", "base", "en", "transcribe") != key
+    assert make_cache_key("hash", "base", None, "translate") != key
+    assert make_cache_key("hash", "base", None, "transcribe", 0.0, None) == key
+    assert range_suffix(5, None) == ":5-"
+    assert range_suffix(0, 12.5) == ":0-12.5"
+
+def test_quantized_outputs_get_their_own_keys(monkeypatch):
+    key = make_cache_key("hash", "base", None, "transcribe")
+    monkeypatch.setattr(cache_module.settings, "CPU_QUANTIZE", True)
+    assert make_cache_key("hash", "base", None, "transcribe") == "hash:base:int8:auto:transcribe"
+    assert make_cache_key("hash", "base", None, "transcribe") != key
@@ -0,0 +1,16 @@
+from app.utils import checkpoints
+from app.utils.checkpoints import ChunkCheckpointStore, checkpoint_key, make_checkpoint_prefix
+
+def test_prefix_separates_quantized_model_variant(monkeypatch):
+    full = make_checkpoint_prefix("hash", "base", None, "transcribe")
+    monkeypatch.setattr(checkpoints.settings, "CPU_QUANTIZE", True)
+    quantized = make_checkpoint_prefix("hash", "base", None, "transcribe")
+    assert quantized != full
+    assert quantized == "hash:base:int8:auto:transcribe"
+
+def test_store_round_trips_chunks(tmp_path):
+    store = ChunkCheckpointStore(str(tmp_path / "checkpoints.db"), 3600)
+    key = checkpoint_key(make_checkpoint_prefix("hash", "base", "en", "transcribe", 5, 10), 0, 16000)
+    assert store.get(key) is None
+    store.set(key, {"text": "hi", "segments": []})
+    assert store.get(key) == {"text": "hi", "segments": []}
@@ -0,0 +1,111 @@
+import numpy as np
+from app.core import chunking
+from app.core.config import settings
+from app.core.chunking import FRAME, drop_overlapping_segments, iter_speech_chunks, plan_chunks
+from app.utils.file_utils import SAMPLE_RATE
+
+SPEECH_DB = -20.0
+ROOM_DB = -60.0
+
+def make_audio(*parts, seed: int = 0) -> np.ndarray:
+    """Concatenate (seconds, level_db) parts of white noise at the given RMS level"""
+    rng = np.random.default_rng(seed)
+    return np.concatenate([
+        (10 ** (level / 20) * rng.standard_normal(int(seconds * SAMPLE_RATE))).astype(np.float32)
+        for seconds, level in parts
+    ])
+
+def seconds(samples: int) -> float:
+    return samples / SAMPLE_RATE
+
+def test_cuts_inside_pauses_of_a_quiet_recording():
+    # 30 dB quieter than usual: an absolute threshold would call all of it silence
+    parts = [(8, SPEECH_DB - 30), (1, ROOM_DB - 30)] * 4
+    audio = make_audio(*parts)
+    chunks = plan_chunks(audio, 20 * SAMPLE_RATE, 5 * SAMPLE_RATE)
+    assert len(chunks) == 2
+    assert all(end - start <= 20 * SAMPLE_RATE for start, end in chunks)
+    # The cut falls in the pause between the second and third speech runs
+    assert 17 <= seconds(chunks[0][1]) <= seconds(chunks[1][0]) <= 18
+
+def test_long_silence_is_skipped():
+    audio = make_audio((5, SPEECH_DB), (30, ROOM_DB), (5, SPEECH_DB))
+    chunks = plan_chunks(audio, 30 * SAMPLE_RATE, 5 * SAMPLE_RATE)
+    assert len(chunks) == 2
+    assert seconds(chunks[0][1]) < 6
+    assert seconds(chunks[1][0]) > 34
+
+def test_recording_without_contrast_is_kept_whole():
+    audio = np.zeros(5 * SAMPLE_RATE, dtype=np.float32)
+    assert plan_chunks(audio, 30 * SAMPLE_RATE, 5 * SAMPLE_RATE) == [(0, len(audio))]
+    assert plan_chunks(np.empty(0, dtype=np.float32), 30 * SAMPLE_RATE, 5 * SAMPLE_RATE) == []
+
+def test_continuous_speech_is_force_cut_with_overlap():
+    audio = make_audio((50, SPEECH_DB))
+    target = 20 * SAMPLE_RATE
+    chunks = plan_chunks(audio, target, 5 * SAMPLE_RATE, threshold_db=-40)
+    assert len(chunks) == 3
+    assert all(end - start <= target for start, end in chunks)
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(audio)
+    for (_, previous_end), (start, _) in zip(chunks, chunks[1:]):
+        # Cuts inside speech overlap by about a second so no word is lost
+        assert 0.9 <= seconds(previous_end - start) <= 1.1
+
+def test_streamed_chunks_match_the_audio_at_their_offsets():
+    parts = [(7, SPEECH_DB), (1, ROOM_DB)] * 10 + [(20, ROOM_DB), (6, SPEECH_DB)]
+    audio = make_audio(*parts)
+    block = 3 * SAMPLE_RATE + FRAME // 2
+    blocks = (audio[i:i + block] for i in range(0, len(audio), block))
+    chunks = list(iter_speech_chunks(blocks, 20 * SAMPLE_RATE, 5 * SAMPLE_RATE))
+    assert len(chunks) > 3
+    previous_start = -1
+    for start, chunk in chunks:
+        assert start > previous_start
+        assert len(chunk) <= 20 * SAMPLE_RATE
+        np.testing.assert_array_equal(chunk, audio[start:start + len(chunk)])
+        previous_start = start
+    # The long silence before the final speech run is never transcribed
+    assert not any(start < 170 * SAMPLE_RATE < start + len(chunk) for start, chunk in chunks)
+    assert seconds(chunks[-1][0] + len(chunks[-1][1])) > len(audio) / SAMPLE_RATE - 1
+
+def test_overlap_segments_are_dropped_by_midpoint():
+    segments = [
+        {"start": 10.0, "end": 11.0},
+        {"start": 11.5, "end": 13.6},
+        {"start": 12.0, "end": 14.0},
+    ]
+    assert drop_overlapping_segments(segments, 12.5) == segments[1:]
+
+def test_short_speech_in_long_room_noise_is_found():
+    # Speech is under 5% of the input, so a mid percentile only ever sees the noise
+    audio = make_audio((60, SPEECH_DB), (20 * 60, ROOM_DB - 10))
+    chunks = plan_chunks(audio, 30 * SAMPLE_RATE, 5 * SAMPLE_RATE)
+    assert chunks
+    assert seconds(chunks[-1][1]) < 61
+
+def test_streaming_releases_the_held_chunk_before_a_long_silence(monkeypatch):
+    planned_lengths = []
+
+    def recording_plan_chunks(audio, *args):
+        planned_lengths.append(len(audio))
+        return plan_chunks(audio, *args)
+    monkeypatch.setattr(chunking, "plan_chunks", recording_plan_chunks)
+
+    block = 3 * SAMPLE_RATE
+    speech = make_audio(*[(7, SPEECH_DB), (1, ROOM_DB)] * 15)
+    rng = np.random.default_rng(1)
+
+    def blocks():
+        for i in range(0, len(speech), block):
+            yield speech[i:i + block]
+        # Ten minutes of room noise after the speech
+        for _ in range(10 * 60 * SAMPLE_RATE // block):
+            yield (10 ** (ROOM_DB / 20) * rng.standard_normal(block)).astype(np.float32)
+
+    target, search = 20 * SAMPLE_RATE, 5 * SAMPLE_RATE
+    chunks = list(iter_speech_chunks(blocks(), target, search))
+    assert chunks
+    assert seconds(chunks[-1][0] + len(chunks[-1][1])) < len(speech) / SAMPLE_RATE + 1
+    # One chunk, one search window, one skipped silence and one block at most
+    ceiling = target + search + int(settings.SILENCE_SKIP_SECONDS * SAMPLE_RATE) + 2 * block
+    assert max(planned_lengths) <= ceiling
@@ -0,0 +1,34 @@
+import sqlite3
+from app.utils.disk_cache import DiskCache
+
+def entry(text: str) -> dict:
+    return {"text": text}
+
+def table_totals(cache: DiskCache):
+    return cache.db.connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcriptions").fetchone()
+
+def test_totals_follow_inserts_replacements_and_evictions(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.db"), 200)
+    cache.set("a", entry("a" * 50))
+    cache.set("b", entry("b"))
+    cache.set("a", entry("shorter"))
+    stats = cache.stats()
+    assert (stats["entries"], stats["size_bytes"]) == table_totals(cache)
+    for i in range(20):
+        cache.set(f"k{i}", entry(str(i) * 40))
+    stats = cache.stats()
+    assert (stats["entries"], stats["size_bytes"]) == table_totals(cache)
+    assert stats["size_bytes"] <= 200
+    assert cache.get("k19") == entry("19" * 40)
+
+def test_totals_are_seeded_for_an_existing_cache(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = DiskCache(path, 10_000)
+    cache.set("a", entry("a"))
+    cache.set("b", entry("b"))
+    conn = sqlite3.connect(path)
+    conn.executescript("DROP TABLE totals; DROP TRIGGER transcriptions_insert;")
+    conn.close()
+    reopened = DiskCache(path, 10_000)
+    assert reopened.stats()["entries"] == 2
+    assert (reopened.stats()["entries"], reopened.stats()["size_bytes"]) == table_totals(reopened)
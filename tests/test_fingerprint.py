@@ -0,0 +1,71 @@
+import asyncio
+import numpy as np
+import pytest
+from app.core import jobs
+from app.core.jobs import JobManager, TranscriptionJob
+from app.utils import fingerprint as fingerprint_module
+from app.utils import cache as cache_module
+from app.utils.cache import TranscriptionCache, make_cache_key, store_cached_result
+from app.utils.file_utils import SAMPLE_RATE
+from app.utils.fingerprint import FingerprintIndex, fingerprint_samples
+
+def make_audio(seed: int, seconds: float = 30.0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    # Tones whose pitch wanders, so band energies change from frame to frame
+    pitch = 200 + 1500 * np.abs(np.sin(t * rng.uniform(0.3, 1.0)))
+    audio = 0.3 * np.sin(2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE) + 0.05 * rng.standard_normal(len(t))
+    return audio.astype(np.float32)
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    index = FingerprintIndex(str(tmp_path / "fingerprints.db"), 3600)
+    monkeypatch.setattr(fingerprint_module, "fingerprint_index", index)
+    return index
+
+def test_reencode_resolves_to_same_id(index):
+    audio = make_audio(1)
+    noisy = audio + 0.01 * np.random.default_rng(2).standard_normal(len(audio)).astype(np.float32)
+    first = index.resolve(fingerprint_samples(audio))
+    assert index.resolve(fingerprint_samples(noisy)) == first
+    assert index.resolve(fingerprint_samples(make_audio(3))) != first
+
+def test_too_short_audio_has_no_fingerprint():
+    assert fingerprint_samples(make_audio(1, seconds=2)) is None
+
+def test_job_serves_fingerprint_match_without_inference(index, tmp_path, monkeypatch):
+    audio = make_audio(1)
+    upload = tmp_path / "clip.mp3"
+    upload.write_bytes(b"re-encoded")
+    monkeypatch.setattr(jobs, "load_audio_input", lambda path, start, end: (audio, len(audio) / SAMPLE_RATE))
+
+    def no_inference(*args):
+        raise AssertionError("a fingerprint match must not reach inference")
+    monkeypatch.setattr(jobs, "transcribe_input", no_inference)
+    released = []
+    monkeypatch.setattr(jobs.admission_controller, "release", released.append)
+    memory = TranscriptionCache(1024 * 1024, 3600)
+    monkeypatch.setattr(cache_module, "transcription_cache", memory)
+    monkeypatch.setattr(cache_module, "disk_cache", None)
+    cached = {"text": "hello", "segments": [{"start": 0.0, "end": 1.0, "text": "hello"}]}
+
+    async def scenario():
+        fingerprint_key = make_cache_key(index.resolve(fingerprint_samples(audio)), "base", None, "transcribe")
+        await store_cached_result(fingerprint_key, cached)
+        manager = JobManager(1, 4, 3600, 16)
+        await manager.start()
+        try:
+            job = manager.submit(TranscriptionJob(str(upload), "clip.mp3", 10, model_size="base",
+                                                  cache_key="bytes-key", admitted_seconds=30.0, fingerprint=True))
+            await job.wait()
+        finally:
+            await manager.stop()
+        assert job.status == "completed"
+        assert job.result == cached
+        assert job.fingerprint_key == fingerprint_key
+        assert "fingerprint" in job.timings
+        assert released == [30.0]
+        # The byte key is filled in too, so the same bytes skip the decode next time
+        assert memory.get("bytes-key") == cached
+
+    asyncio.run(scenario())
@@ -0,0 +1,60 @@
+import asyncio
+from app.core.jobs import JobManager, TranscriptionJob
+from app.utils.job_store import JobStore
+
+def make_store(tmp_path, ttl=3600, max_finished=10) -> JobStore:
+    return JobStore(str(tmp_path / "jobs.db"), ttl, max_finished)
+
+def test_older_snapshot_never_overwrites_newer(tmp_path):
+    store = make_store(tmp_path)
+    store.set("a", 2, {"status": "running"}, False)
+    store.set("a", 1, {"status": "queued"}, False)
+    assert store.get("a") == {"status": "running"}
+    store.set("a", 3, {"status": "completed"}, True)
+    assert store.get("a") == {"status": "completed"}
+    assert store.get("missing") is None
+
+def test_sweep_keeps_newest_finished(tmp_path, monkeypatch):
+    store = make_store(tmp_path, max_finished=2)
+    monkeypatch.setattr(store.db, "sweep_every", 4)
+    store.set("running", 1, {}, False)
+    for name in ("old", "mid", "new"):
+        store.set(name, 1, {}, True)
+    ids = {row[0] for row in store.db.connect().execute("SELECT id FROM jobs")}
+    assert ids == {"running", "mid", "new"}
+
+def test_other_worker_sees_pollable_job(tmp_path):
+    audio = tmp_path / "clip.wav"
+    audio.write_bytes(b"not audio")
+
+    async def scenario():
+        worker = JobManager(1, 4, 3600, 16, make_store(tmp_path))
+        other = JobManager(1, 4, 3600, 16, make_store(tmp_path))
+        await worker.start()
+        try:
+            job = worker.submit(TranscriptionJob(str(audio), "clip.wav", 9, pollable=True))
+            await job.wait()
+            # The status write runs in the default executor; give it a moment
+            for _ in range(50):
+                status = await other.status(job.id)
+                if status is not None and status["status"] == "failed":
+                    break
+                await asyncio.sleep(0.01)
+            assert status["job_id"] == job.id
+            assert status["status"] == "failed"
+            assert await other.status("missing") is None
+        finally:
+            await worker.stop()
+    asyncio.run(scenario())
+
+def test_single_process_keeps_jobs_in_memory(tmp_path):
+    async def scenario():
+        manager = JobManager(1, 4, 3600, 16)
+        await manager.start()
+        try:
+            job = manager.submit(TranscriptionJob(str(tmp_path / "missing.wav"), "missing.wav", 0, pollable=True))
+            await job.wait()
+            assert (await manager.status(job.id))["status"] == "failed"
+        finally:
+            await manager.stop()
+    asyncio.run(scenario())
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import numpy as np
+from app.core import jobs
+from app.core.jobs import JobManager, TranscriptionJob
+from app.utils.file_utils import SAMPLE_RATE
+
+CHUNKS = 50
+
+def test_cancelled_stream_job_stops_inference(tmp_path, monkeypatch):
+    audio = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    upload = tmp_path / "long.wav"
+    upload.write_bytes(b"audio")
+    monkeypatch.setattr(jobs, "load_audio_input", lambda path, start, end: (audio, 3600.0))
+    monkeypatch.setattr(jobs.batch_scheduler, "accepts", lambda audio: False)
+    released = []
+    monkeypatch.setattr(jobs.admission_controller, "release", released.append)
+    transcribed = []
+    resume = threading.Event()
+
+    def transcribe_input(path, audio, duration, language, task, progress, publish_segments, *args):
+        for i in range(CHUNKS):
+            transcribed.append(i)
+            publish_segments(i, [{"start": i, "end": i + 1, "text": "word"}], "word")
+            if i == 0:
+                resume.wait(5)
+        raise AssertionError("a cancelled job must stop between chunks")
+    monkeypatch.setattr(jobs, "transcribe_input", transcribe_input)
+
+    async def scenario():
+        manager = JobManager(1, 4, 3600, 16)
+        await manager.start()
+        try:
+            job = manager.submit(TranscriptionJob(str(upload), "long.wav", 5, stream=True, admitted_seconds=3600.0))
+            first = await asyncio.wait_for(job.events.get(), 5)
+            assert first["chunk"] == 0
+            manager.cancel(job.id)
+            resume.set()
+            await asyncio.wait_for(job.wait(), 5)
+            assert job.status == "failed" and job.error == "cancelled"
+            assert job.events is None
+            assert manager.get(job.id) is None
+        finally:
+            await manager.stop()
+
+    asyncio.run(scenario())
+    assert transcribed == [0, 1]
+    assert released == [3600.0]
+    assert not upload.exists()
+
+def test_cancelled_queued_job_never_runs(tmp_path, monkeypatch):
+    def load_audio_input(*args):
+        raise AssertionError("a cancelled job must not be decoded")
+    monkeypatch.setattr(jobs, "load_audio_input", load_audio_input)
+    released = []
+    monkeypatch.setattr(jobs.admission_controller, "release", released.append)
+    upload = tmp_path / "clip.wav"
+    upload.write_bytes(b"audio")
+
+    async def scenario():
+        manager = JobManager(1, 4, 3600, 16)
+        await manager.start()
+        try:
+            job = manager.submit(TranscriptionJob(str(upload), "clip.wav", 5, stream=True, admitted_seconds=10.0))
+            manager.cancel(job.id)
+            await asyncio.wait_for(job.wait(), 5)
+            assert job.status == "failed"
+        finally:
+            await manager.stop()
+
+    asyncio.run(scenario())
+    assert released == [10.0]
@@ -0,0 +1,29 @@
+from app.core import models
+from app.core.models import ModelRegistry, estimated_load_bytes
+
+MB = 1024 * 1024
+
+def test_load_estimate_covers_size_variants():
+    assert estimated_load_bytes("base") == estimated_load_bytes("base.en") == 74_000_000 * 4
+    assert estimated_load_bytes("large-v3") == 1_550_000_000 * 4
+    assert estimated_load_bytes("custom") == 0
+
+def test_registry_evicts_before_loading(monkeypatch):
+    registry = ModelRegistry(budget_bytes=estimated_load_bytes("small") + 400 * MB, default_size="small")
+    resident_at_load = []
+
+    def load(size, device):
+        resident_at_load.append(set(registry._models))
+        return size
+    monkeypatch.setattr(models, "_load_model", load)
+    monkeypatch.setattr(models, "_device", lambda: "cpu")
+    monkeypatch.setattr(models, "model_memory_bytes", lambda loaded: estimated_load_bytes(loaded))
+
+    registry.get("small")
+    registry.get("base")
+    assert set(registry._models) == {"small", "base"}
+    registry.get("tiny")
+    # base had to go for tiny to fit, and was gone before tiny's weights were read
+    assert resident_at_load[-1] == {"small"}
+    assert set(registry._models) == {"small", "tiny"}
+    assert registry.resident_bytes <= registry.budget_bytes
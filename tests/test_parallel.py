@@ -0,0 +1,19 @@
+from app.core import parallel
+
+def test_chunk_worker_keeps_default_and_one_other_model(monkeypatch):
+    loads = []
+
+    def load(size):
+        loads.append(size)
+        return f"model-{size}"
+    monkeypatch.setattr(parallel, "_load_model", load)
+    monkeypatch.setattr(parallel, "_worker_models", {})
+    monkeypatch.setattr(parallel, "_default_size", "small")
+
+    assert parallel._worker_model("small") == "model-small"
+    assert parallel._worker_model("tiny") == "model-tiny"
+    assert parallel._worker_model("tiny") == "model-tiny"
+    assert parallel._worker_model("medium") == "model-medium"
+    assert set(parallel._worker_models) == {"small", "medium"}
+    assert parallel._worker_model("small") == "model-small"
+    assert loads == ["small", "tiny", "medium"]
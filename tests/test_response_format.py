@@ -0,0 +1,79 @@
+import gzip
+import json
+import pytest
+from starlette.requests import Request
+from app.utils import response_format
+from app.utils.response_format import (
+    MIN_COMPRESS_BYTES, UnsupportedFormatError, parse_field_list, render_response, select_fields,
+)
+
+RESULT = {
+    "text": "hello world",
+    "language": "en",
+    "segments": [
+        {"id": 0, "start": 0.0, "end": 1.0, "text": "hello", "tokens": [1, 2]},
+        {"id": 1, "start": 1.0, "end": 2.0, "text": "world", "tokens": [3]},
+    ],
+}
+
+def make_request(**headers) -> Request:
+    return Request({
+        "type": "http",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+def test_parse_field_list():
+    assert parse_field_list(None) is None
+    assert parse_field_list("text, segments,,") == {"text", "segments"}
+
+def test_defaults_return_result_unchanged():
+    assert select_fields(RESULT) is RESULT
+
+def test_fields_and_include_trim_keys():
+    shaped = select_fields(RESULT, fields={"text", "segments"}, include={"start", "text"})
+    assert set(shaped) == {"text", "segments"}
+    assert shaped["segments"] == [{"start": 0.0, "text": "hello"}, {"start": 1.0, "text": "world"}]
+    assert "language" in RESULT and "tokens" in RESULT["segments"][0]
+
+def test_tokens_false_drops_token_ids():
+    shaped = select_fields(RESULT, tokens=False)
+    assert all("tokens" not in segment for segment in shaped["segments"])
+    assert shaped["segments"][0]["text"] == "hello"
+
+def test_columns_layout_gives_parallel_arrays():
+    shaped = select_fields(RESULT, include={"start", "end"}, layout="columns")
+    assert shaped["segments"] == {"start": [0.0, 1.0], "end": [1.0, 2.0]}
+    assert select_fields({**RESULT, "segments": []}, layout="columns")["segments"] == {}
+
+def test_unknown_layout_is_rejected():
+    with pytest.raises(ValueError):
+        select_fields(RESULT, layout="tree")
+
+def test_large_json_is_gzipped_when_accepted(monkeypatch):
+    monkeypatch.setattr(response_format, "zstandard", None)
+    payload = {"text": "x" * (MIN_COMPRESS_BYTES * 2)}
+    response = render_response(payload, make_request(accept_encoding="gzip, br"))
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+    assert json.loads(gzip.decompress(response.body)) == payload
+
+def test_small_or_refused_bodies_are_not_compressed(monkeypatch):
+    monkeypatch.setattr(response_format, "zstandard", None)
+    small = render_response({"text": "hi"}, make_request(accept_encoding="gzip"))
+    assert "content-encoding" not in small.headers
+    refused = render_response({"text": "x" * (MIN_COMPRESS_BYTES * 2)}, make_request(accept_encoding="gzip;q=0"))
+    assert "content-encoding" not in refused.headers
+    assert json.loads(refused.body)["text"].startswith("x")
+
+def test_msgpack_without_the_package_is_unsupported(monkeypatch):
+    monkeypatch.setattr(response_format, "msgpack", None)
+    with pytest.raises(UnsupportedFormatError):
+        render_response(RESULT, make_request(), "msgpack")
+    with pytest.raises(UnsupportedFormatError):
+        render_response(RESULT, make_request(accept="application/msgpack"))
+
+def test_msgpack_round_trips():
+    msgpack = pytest.importorskip("msgpack")
+    response = render_response(RESULT, make_request(accept="application/msgpack"))
+    assert response.media_type == "application/msgpack"
+    assert msgpack.unpackb(response.body) == RESULT
@@ -0,0 +1,59 @@
+import sqlite3
+import time
+import pytest
+from app.utils import sqlite_limits
+from app.utils.sqlite_limits import SQLiteStorage
+
+@pytest.fixture
+def storage(tmp_path):
+    return SQLiteStorage(f"sqlite://{tmp_path / 'limits.db'}")
+
+def test_incr_counts_within_window(storage):
+    assert storage.incr("a", 60) == 1
+    assert storage.incr("a", 60, 4) == 5
+    assert storage.get("a") == 5
+    assert storage.get("b") == 0
+    assert time.time() < storage.get_expiry("a") <= time.time() + 60
+
+def test_expired_window_starts_over(storage):
+    storage.incr("a", 0.05, 3)
+    time.sleep(0.1)
+    assert storage.get("a") == 0
+    assert storage.incr("a", 60) == 1
+
+def test_workers_share_counters(tmp_path):
+    uri = f"sqlite://{tmp_path / 'limits.db'}"
+    SQLiteStorage(uri).incr("a", 60, 2)
+    assert SQLiteStorage(uri).incr("a", 60) == 3
+
+def test_clear_and_reset(storage):
+    storage.incr("a", 60)
+    storage.incr("b", 60)
+    storage.clear("a")
+    assert storage.get("a") == 0
+    assert storage.reset() == 1
+    assert storage.get("b") == 0
+    assert storage.check()
+
+def test_sweep_drops_expired_counters(storage, monkeypatch):
+    monkeypatch.setattr(storage.db, "sweep_every", 2)
+    storage.incr("old", 0.05)
+    time.sleep(0.1)
+    storage.incr("new", 60)
+    rows = storage.db.connect().execute("SELECT key FROM counters").fetchall()
+    assert rows == [("new",)]
+
+def test_fails_open_while_another_worker_holds_the_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_limits, "BUSY_TIMEOUT", 0.05)
+    path = tmp_path / "limits.db"
+    storage = SQLiteStorage(f"sqlite://{path}")
+    storage.incr("a", 60, 2)
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN EXCLUSIVE")
+    try:
+        started = time.monotonic()
+        assert storage.incr("a", 60) == 0
+        assert time.monotonic() - started < 1
+    finally:
+        other.execute("ROLLBACK")
+    assert storage.get("a") == 2
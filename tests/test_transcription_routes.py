@@ -0,0 +1,31 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.admission import ClientQuota, admission_controller
+from app.core.jobs import JobQueueFullError
+from app.routes import transcription
+
+@pytest.fixture
+def quota(monkeypatch):
+    quota = ClientQuota(limit_seconds=3600, window=3600, storage_uri="memory://")
+    monkeypatch.setattr(transcription, "client_quota", quota)
+    monkeypatch.setattr(transcription, "is_model_ready", lambda: True)
+    monkeypatch.setattr(transcription, "probe_duration", lambda path: 120.0)
+    return quota
+
+def make_client() -> TestClient:
+    app = FastAPI()
+    app.include_router(transcription.router, prefix="/api/v1")
+    return TestClient(app)
+
+def test_full_job_queue_refunds_quota_and_admission(quota, monkeypatch):
+    def queue_full(job):
+        raise JobQueueFullError("Too many queued transcriptions, try again later")
+    monkeypatch.setattr(transcription.job_manager, "submit", queue_full)
+    in_flight = admission_controller.in_flight_seconds
+
+    response = make_client().post("/api/v1/jobs?use_cache=false", files={"audio": ("a.mp3", b"x" * 100)})
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    assert admission_controller.in_flight_seconds == in_flight
+    assert quota._storage.get(quota._key("testclient")) == 0
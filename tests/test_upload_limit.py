@@ -0,0 +1,50 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+from app.middleware.upload_limit import UploadSizeLimitMiddleware
+
+LIMIT = 1024
+
+def make_client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware, max_body_size=LIMIT)
+
+    @app.post("/upload")
+    async def upload(audio: UploadFile = File(...)):
+        return {"size": len(await audio.read())}
+
+    return TestClient(app)
+
+def multipart_body(payload: bytes) -> bytes:
+    return (
+        b"--boundary\r\n"
+        b'Content-Disposition: form-data; name="audio"; filename="a.mp3"\r\n'
+        b"Content-Type: audio/mpeg\r\n\r\n" + payload + b"\r\n--boundary--\r\n"
+    )
+
+HEADERS = {"Content-Type": "multipart/form-data; boundary=boundary"}
+
+def chunked(body: bytes, size: int = 256):
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+def test_small_upload_passes():
+    response = make_client().post("/upload", files={"audio": ("a.mp3", b"x" * 100)})
+    assert response.status_code == 200
+    assert response.json() == {"size": 100}
+
+def test_declared_length_over_limit_is_413():
+    response = make_client().post("/upload", files={"audio": ("a.mp3", b"x" * (LIMIT * 2))})
+    assert response.status_code == 413
+    assert response.json() == {"detail": "File too large"}
+
+def test_chunked_body_over_limit_is_413():
+    body = multipart_body(b"x" * (LIMIT * 4))
+    response = make_client().post("/upload", content=chunked(body), headers=HEADERS)
+    assert response.status_code == 413
+    assert response.json() == {"detail": "File too large"}
+
+def test_chunked_body_under_limit_passes():
+    body = multipart_body(b"x" * 100)
+    response = make_client().post("/upload", content=chunked(body, 64), headers=HEADERS)
+    assert response.status_code == 200
+    assert response.json() == {"size": 100}